@@ -27,6 +27,7 @@ from langgraph.prebuilt import create_react_agent
 try:
     import chromadb
     from sentence_transformers import SentenceTransformer
+    from app.services.chroma_integration import get_embedding_model
     CHROMADB_AVAILABLE = True
 except ImportError:
     CHROMADB_AVAILABLE = False
@@ -72,7 +73,7 @@ class ChromaMemoryStore:
         self.client = chromadb.PersistentClient(path=str(self.persist_directory))
         
         # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = get_embedding_model()
         
         # Cache for collections
         self.collections = {}
@@ -32,6 +32,7 @@ from app.utils.path_safety import (
 try:
     import chromadb
     from sentence_transformers import SentenceTransformer
+    from app.services.chroma_integration import get_embedding_model
     VECTOR_STORE_AVAILABLE = True
 except ImportError:
     VECTOR_STORE_AVAILABLE = False
@@ -106,7 +107,7 @@ class ChromaVectorStore:
         self.client = chromadb.PersistentClient(path=str(self.persist_directory))
         
         # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = get_embedding_model()
         
         # Cache for collections
         self.collections = {}
@@ -511,15 +512,12 @@ def write_file_content(file_path: str, content: str) -> Dict[str, Any]:
         # Log successful file write
         logger.debug(f"Successfully wrote file: {file_path} -> {safe_path}")
         
-        # Automatically index file in ChromaDB
+        # Automatically index file in ChromaDB; embedding and upsert happen on
+        # the integration's background writer so the write returns immediately
         if CHROMA_INTEGRATION_AVAILABLE:
             try:
-                # Run async function in sync context
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(chroma_integration.index_file(str(safe_path)))
-                loop.close()
-                logger.info(f"Successfully indexed {file_path} in ChromaDB")
+                if chroma_integration.schedule_index_file(str(safe_path), content):
+                    logger.info(f"Queued {file_path} for ChromaDB indexing")
             except Exception as e:
                 logger.warning(f"Failed to index {file_path} in ChromaDB: {e}")
         
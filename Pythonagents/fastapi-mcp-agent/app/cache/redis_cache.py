@@ -2,11 +2,17 @@ import redis
 import json
 import hashlib
 import logging
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Union
 from datetime import datetime, timedelta
 import asyncio
 from contextlib import asynccontextmanager
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 class RedisCache:
@@ -48,17 +54,24 @@ class RedisCache:
 
     def _get_cache_key(self, prefix: str, data: Dict[str, Any]) -> str:
         """Generate a deterministic cache key from request data."""
-        # Create a sorted JSON string for consistent hashing
-        data_str = json.dumps(data, sort_keys=True)
-        hash_obj = hashlib.sha256(data_str.encode())
-        return f"{prefix}:{hash_obj.hexdigest()[:16]}"
-
-    async def get_cached_response(self, request_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Create a sorted JSON encoding for consistent hashing
+        if ORJSON_AVAILABLE:
+            data_bytes = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        else:
+            data_bytes = json.dumps(data, sort_keys=True).encode()
+        hash_obj = hashlib.blake2b(data_bytes, digest_size=8)
+        return f"{prefix}:{hash_obj.hexdigest()}"
+
+    def response_cache_key(self, request_data: Dict[str, Any]) -> str:
+        """Key for an LLM response; pass it to get/set_cached_response to hash the request once."""
+        return self._get_cache_key("llm_response", request_data)
+
+    async def get_cached_response(self, request_data: Union[Dict[str, Any], str]) -> Optional[Dict[str, Any]]:
         """Retrieve cached LLM response if available."""
         if not self._client:
             return None
 
-        cache_key = self._get_cache_key("llm_response", request_data)
+        cache_key = request_data if isinstance(request_data, str) else self.response_cache_key(request_data)
 
         try:
             cached_data = await asyncio.get_event_loop().run_in_executor(
@@ -76,14 +89,14 @@ class RedisCache:
             logger.error(f"Error retrieving from cache: {e}")
             return None
 
-    async def set_cached_response(self, request_data: Dict[str, Any],
+    async def set_cached_response(self, request_data: Union[Dict[str, Any], str],
                                 response_data: Dict[str, Any],
                                 ttl_seconds: int = 3600) -> bool:
         """Cache LLM response with TTL."""
         if not self._client:
             return False
 
-        cache_key = self._get_cache_key("llm_response", request_data)
+        cache_key = request_data if isinstance(request_data, str) else self.response_cache_key(request_data)
 
         try:
             # Add metadata to cached response
@@ -3,6 +3,7 @@ import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.routers import chat, sandbox, models, execute, conversations, chat_logs, sessions, vector, preview, project_context
 from app.database import init_database
@@ -58,6 +59,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads such as /sandbox/{id}/context file trees
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Add trusted host middleware (configure for production)
 if os.getenv("ENVIRONMENT") == "production":
     app.add_middleware(
@@ -104,5 +108,10 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
         reload=True if os.getenv("ENVIRONMENT") != "production" else False,
-        log_level="info"
+        log_level="info",
+        # Let uvicorn keep WebSocket connections alive with native ping/pong frames
+        ws_ping_interval=20,
+        ws_ping_timeout=20,
+        # Negotiate permessage-deflate so metadata broadcasts are compressed on the wire
+        ws_per_message_deflate=True
     )
\ No newline at end of file
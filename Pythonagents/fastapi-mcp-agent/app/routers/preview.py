@@ -1,6 +1,8 @@
 import logging
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
+from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
 import uuid
@@ -259,4 +261,26 @@ async def stop_preview(sandboxId: str = Query(..., description="Sandbox ID")):
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to stop preview for sandbox {sandboxId}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to stop preview")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to stop preview")
+
+# Served pages get an opaque origin so sandbox scripts cannot act as the API's origin
+STATIC_PREVIEW_HEADERS = {
+    "Content-Security-Policy": "sandbox allow-scripts allow-forms allow-popups",
+    "X-Content-Type-Options": "nosniff",
+}
+
+@router.get("/preview/{sandbox_id}/{file_path:path}")
+async def serve_static_preview(sandbox_id: str, file_path: str):
+    """Serve files for a running static (vanilla) sandbox preview."""
+    project_path = sandbox_service.static_previews.get(sandbox_id)
+    if not project_path:
+        raise HTTPException(status_code=404, detail="Preview not running")
+
+    root = Path(project_path).resolve()
+    target = (root / file_path).resolve()
+    if target.is_dir():
+        target = target / "index.html"
+    if not target.is_relative_to(root) or not target.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return FileResponse(target, headers=STATIC_PREVIEW_HEADERS)
@@ -14,6 +14,8 @@ class ProjectContextRequest(BaseModel):
     project_path: str
     max_depth: Optional[int] = 3
     include_file_contents: Optional[bool] = True
+    # Recompute even if the cached context for an unchanged tree is available
+    refresh: Optional[bool] = False
 
 class ProjectContextResponse(BaseModel):
     success: bool
@@ -50,7 +52,8 @@ async def get_project_context(request: ProjectContextRequest):
         # Gather full context
         context = await context_service.gather_full_context(
             max_depth=request.max_depth,
-            include_file_contents=request.include_file_contents
+            include_file_contents=request.include_file_contents,
+            refresh=request.refresh
         )
         
         return ProjectContextResponse(
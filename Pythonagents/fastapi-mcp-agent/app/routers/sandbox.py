@@ -1,14 +1,23 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+import asyncio
 import uuid
 import os
+import errno
 import json
 from app.database import get_or_create_session, Sandbox
 from app.sandbox_service import sandbox_service, SandboxEnvironment, SandboxConfig
-from app.websocket_utils import broadcast_sandbox_update, active_websocket_connections
+from app.utils.fast_rmtree import fast_rmtree, force_rmtree
+from app.websocket_utils import (
+    broadcast_sandbox_update,
+    active_websocket_connections,
+    serialize_message,
+    get_initial_snapshot,
+    store_initial_snapshot,
+)
 from app.agents.code_intelligence import CodeIntelligenceService
 from app.agents.symbol_index import get_symbol_index_service
 
@@ -24,7 +33,7 @@ def extract_enhanced_metadata(sandbox) -> Dict[str, Any]:
     # Ensure metadata is a dictionary, handle cases where it might be a list or None
     metadata = sandbox.metadata
     if not isinstance(metadata, dict):
-        logger.warning(f"Sandbox {sandbox.sandboxId} has invalid metadata type: {type(metadata)}, using empty dict")
+        logger.warning("Sandbox %s has invalid metadata type: %s, using empty dict", sandbox.sandboxId, type(metadata))
         return {}
     
     enhanced = {}
@@ -58,6 +67,31 @@ def extract_enhanced_metadata(sandbox) -> Dict[str, Any]:
     
     return enhanced
 
+# Key paths into sandbox metadata used by the context endpoint
+_FILE_COUNT_PATH = ("file_statistics", "file_count")
+_FILE_CATEGORIES_PATH = ("file_statistics", "file_categories")
+_DIRECTORY_COUNT_PATH = ("project_structure", "total_directories")
+_MAX_DEPTH_PATH = ("project_structure", "max_depth")
+_TOP_LEVEL_ITEMS_PATH = ("project_structure", "top_level_items")
+_TOTAL_SIZE_PATH = ("size_analysis", "total_size")
+_TOTAL_SIZE_FORMATTED_PATH = ("size_analysis", "total_size_formatted")
+_LARGEST_FILES_PATH = ("size_analysis", "largest_files")
+
+def safe_nested_get(obj: Any, keys: tuple, default: Any = None) -> Any:
+    """Safely get a nested value: safe_nested_get(metadata, ('file_statistics', 'file_count'), 0)"""
+    try:
+        for key in keys:
+            obj = obj[key]
+        return obj
+    except (KeyError, TypeError):
+        return default
+
+def diff_metadata(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Return the top-level metadata keys that changed or were added, and those removed."""
+    changes = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changes, removed
+
 class SandboxCreateRequest(BaseModel):
     name: Optional[str] = None
     type: str
@@ -163,23 +197,23 @@ async def create_sandbox(request: SandboxCreateRequest):
         )
         await sandbox.insert()
 
-        logger.info(f"Created sandbox {environment.id}")
+        logger.info("Created sandbox %s", environment.id)
 
         # Index project files for code intelligence
         try:
             code_intel = CodeIntelligenceService()
             await code_intel.index_project_files(environment.project_path)
-            logger.info(f"Indexed project files for sandbox {environment.id}")
+            logger.info("Indexed project files for sandbox %s", environment.id)
         except Exception as e:
-            logger.warning(f"Failed to index project files for sandbox {environment.id}: {e}")
+            logger.warning("Failed to index project files for sandbox %s: %s", environment.id, e)
 
         # Build symbol index for fast lookups
         try:
             symbol_index = get_symbol_index_service(environment.project_path)
             index_time = await symbol_index.build_index()
-            logger.info(f"Built symbol index for sandbox {environment.id} in {index_time:.2f}s")
+            logger.info("Built symbol index for sandbox %s in %.2fs", environment.id, index_time)
         except Exception as e:
-            logger.warning(f"Failed to build symbol index for sandbox {environment.id}: {e}")
+            logger.warning("Failed to build symbol index for sandbox %s: %s", environment.id, e)
 
         # Extract enhanced metadata for better agent context
         enhanced_metadata = extract_enhanced_metadata(sandbox)
@@ -207,7 +241,7 @@ async def create_sandbox(request: SandboxCreateRequest):
             **enhanced_metadata
         )
     except Exception as e:
-        logger.error(f"Failed to create sandbox: {e}")
+        logger.error("Failed to create sandbox: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create sandbox")
 
 @router.get("/sandbox")
@@ -237,7 +271,7 @@ async def get_all_sandboxes(enhanced: bool = Query(False, description="Include e
 
         return {"success": True, "sandboxes": result}
     except Exception as e:
-        logger.error(f"Failed to get sandboxes: {e}")
+        logger.error("Failed to get sandboxes: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get sandboxes")
 
 
@@ -295,7 +329,7 @@ async def get_system_stats():
         }
 
     except Exception as e:
-        logger.error(f"Failed to get system stats: {e}")
+        logger.error("Failed to get system stats: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get system stats")
 
 
@@ -311,7 +345,7 @@ async def get_sandbox_stats(sandbox_id: str, detailed: bool = Query(False, descr
         # Ensure metadata is a dictionary, handle cases where it might be a list or None
         metadata = sandbox.metadata
         if not isinstance(metadata, dict):
-            logger.warning(f"Sandbox {sandbox_id} has invalid metadata type: {type(metadata)}, using empty dict")
+            logger.warning("Sandbox %s has invalid metadata type: %s, using empty dict", sandbox_id, type(metadata))
             metadata = {}
         
         # Basic stats
@@ -344,7 +378,7 @@ async def get_sandbox_stats(sandbox_id: str, detailed: bool = Query(False, descr
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get sandbox stats for {sandbox_id}: {e}")
+        logger.error("Failed to get sandbox stats for %s: %s", sandbox_id, e)
         raise HTTPException(status_code=500, detail="Failed to get sandbox stats")
 
 
@@ -383,71 +417,52 @@ async def get_sandbox(sandbox_id: str, enhanced: bool = Query(False, description
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get sandbox {sandbox_id}: {e}")
+        logger.error("Failed to get sandbox %s: %s", sandbox_id, e)
         raise HTTPException(status_code=500, detail="Failed to get sandbox")
 
 @router.delete("/sandbox/{sandboxId}")
 async def delete_sandbox(sandboxId: str):
     """Delete a sandbox."""
     try:
-        # Try to delete from the sandbox service first
         try:
+            # Stops the dev server, removes the directory and queues the database
+            # delete in the service's ordered write queue
             await sandbox_service.delete_sandbox(sandboxId)
         except ValueError:
-            # Sandbox not in memory, that's ok - it might only be in database
-            pass
-        except Exception as e:
-            logger.warning(f"Sandbox service delete failed for {sandboxId}: {e}")
-            # Continue with database cleanup even if service delete fails
-
-        # Wait a bit for any remaining processes to terminate
-        import asyncio
-        await asyncio.sleep(1)
-
-        # Also remove from database
-        sandbox = await Sandbox.find_one(Sandbox.sandboxId == sandboxId)
-        if sandbox:
-            # Clean up directory if it exists (with better error handling)
-            if sandbox.projectPath and os.path.exists(sandbox.projectPath):
-                try:
-                    import shutil
-                    shutil.rmtree(sandbox.projectPath)
-                    logger.info(f"Deleted directory {sandbox.projectPath} for sandbox {sandboxId}")
-                except OSError as e:
-                    if e.errno == 66:  # Directory not empty
-                        logger.warning(f"Directory {sandbox.projectPath} not empty, attempting force delete")
-                        # Try to force delete by removing files individually
-                        try:
-                            for root, dirs, files in os.walk(sandbox.projectPath, topdown=False):
-                                for name in files:
-                                    try:
-                                        os.remove(os.path.join(root, name))
-                                    except OSError:
-                                        pass  # Ignore individual file deletion errors
-                                for name in dirs:
-                                    try:
-                                        os.rmdir(os.path.join(root, name))
-                                    except OSError:
-                                        pass  # Ignore individual directory deletion errors
-                            os.rmdir(sandbox.projectPath)
-                            logger.info(f"Force deleted directory {sandbox.projectPath} for sandbox {sandboxId}")
-                        except Exception as force_e:
-                            logger.error(f"Failed to force delete directory {sandbox.projectPath}: {force_e}")
-                            # Don't raise error, just log it - sandbox is still deleted from DB
-                    else:
-                        logger.error(f"Failed to delete directory {sandbox.projectPath}: {e}")
-                        # Don't raise error for directory deletion failures
-            
-            await sandbox.delete()
-
-        logger.info(f"Deleted sandbox {sandboxId}")
+            # The service could not load the sandbox; clean up whatever the
+            # database still holds directly
+            sandbox = await Sandbox.find_one(Sandbox.sandboxId == sandboxId)
+            if sandbox:
+                # Clean up directory if it exists (with better error handling)
+                if sandbox.projectPath and os.path.exists(sandbox.projectPath):
+                    try:
+                        # node_modules trees are deleted by a thread pool, off the event loop
+                        await asyncio.to_thread(fast_rmtree, sandbox.projectPath)
+                        logger.info("Deleted directory %s for sandbox %s", sandbox.projectPath, sandboxId)
+                    except OSError as e:
+                        if e.errno == errno.ENOTEMPTY:
+                            logger.warning("Directory %s not empty, attempting force delete", sandbox.projectPath)
+                            # Try to force delete by removing files individually
+                            try:
+                                await asyncio.to_thread(force_rmtree, sandbox.projectPath)
+                                logger.info("Force deleted directory %s for sandbox %s", sandbox.projectPath, sandboxId)
+                            except Exception as force_e:
+                                logger.error("Failed to force delete directory %s: %s", sandbox.projectPath, force_e)
+                                # Don't raise error, just log it - sandbox is still deleted from DB
+                        else:
+                            logger.error("Failed to delete directory %s: %s", sandbox.projectPath, e)
+                            # Don't raise error for directory deletion failures
+
+                await sandbox.delete()
+
+        logger.info("Deleted sandbox %s", sandboxId)
         
         # Broadcast sandbox deletion update
         await broadcast_sandbox_update("deleted", {"id": sandboxId})
         
         return {"success": True, "message": "Sandbox deleted successfully"}
     except Exception as e:
-        logger.error(f"Failed to delete sandbox {sandboxId}: {e}")
+        logger.error("Failed to delete sandbox %s: %s", sandboxId, e)
         raise HTTPException(status_code=500, detail="Failed to delete sandbox")
 
 @router.put("/sandbox/{sandbox_id}")
@@ -475,7 +490,7 @@ async def update_sandbox_body(request: SandboxUpdateRequest):
 
         await sandbox.save()
 
-        logger.info(f"Updated sandbox {request.sandboxId}")
+        logger.info("Updated sandbox %s", request.sandboxId)
         
         # Broadcast sandbox update
         await broadcast_sandbox_update("updated", {
@@ -500,7 +515,7 @@ async def update_sandbox_body(request: SandboxUpdateRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to update sandbox {request.sandboxId}: {e}")
+        logger.error("Failed to update sandbox %s: %s", request.sandboxId, e)
         raise HTTPException(status_code=500, detail="Failed to update sandbox")
 
 @router.post("/sandbox/execute")
@@ -515,7 +530,7 @@ async def execute_code_in_sandbox(
         if not sandbox_id:
             raise HTTPException(status_code=400, detail="sandboxId is required")
 
-        logger.info(f"Executing {request.language} code in sandbox {sandbox_id}")
+        logger.info("Executing %s code in sandbox %s", request.language, sandbox_id)
 
         # For now, we'll use a simple execution approach
         # In a real implementation, this would use the sandbox service
@@ -558,7 +573,7 @@ async def execute_code_in_sandbox(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to execute code: {e}")
+        logger.error("Failed to execute code: %s", e)
         return ExecuteResponse(
             success=False,
             error=str(e)
@@ -588,7 +603,7 @@ async def save_file(sandboxId: str, filePath: str, request: Request):
                     port = sandbox_service.find_available_port()
                 environment.config = SandboxConfig(sandboxId, db_sandbox.projectPath, port)
                 sandbox_service.environments[sandboxId] = environment
-                logger.info(f"Loaded sandbox {sandboxId} from database for file save")
+                logger.info("Loaded sandbox %s from database for file save", sandboxId)
             else:
                 raise HTTPException(status_code=404, detail="Sandbox not found")
 
@@ -609,17 +624,17 @@ async def save_file(sandboxId: str, filePath: str, request: Request):
         # Update sandbox metadata after file save
         try:
             await sandbox_service.update_project_metadata(sandboxId)
-            logger.info(f"Updated metadata for sandbox {sandboxId} after file save")
+            logger.info("Updated metadata for sandbox %s after file save", sandboxId)
         except Exception as e:
-            logger.warning(f"Failed to update metadata for sandbox {sandboxId}: {e}")
+            logger.warning("Failed to update metadata for sandbox %s: %s", sandboxId, e)
 
-        logger.info(f"Saved file {filePath} in sandbox {sandboxId}")
+        logger.info("Saved file %s in sandbox %s", filePath, sandboxId)
         return {"success": True, "message": "File saved successfully"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to save file: {e}")
+        logger.error("Failed to save file: %s", e)
         raise HTTPException(status_code=500, detail="Failed to save file")
 
 @router.get("/sandbox/{sandboxId}/files/{filePath:path}")
@@ -643,7 +658,7 @@ async def read_file(sandboxId: str, filePath: str):
                     port = sandbox_service.find_available_port()
                 environment.config = SandboxConfig(sandboxId, db_sandbox.projectPath, port)
                 sandbox_service.environments[sandboxId] = environment
-                logger.info(f"Loaded sandbox {sandboxId} from database for file read")
+                logger.info("Loaded sandbox %s from database for file read", sandboxId)
             else:
                 raise HTTPException(status_code=404, detail="Sandbox not found")
 
@@ -666,7 +681,7 @@ async def read_file(sandboxId: str, filePath: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to read file: {e}")
+        logger.error("Failed to read file: %s", e)
         raise HTTPException(status_code=500, detail="Failed to read file")
 
 @router.get("/sandbox/files/{sandboxId}")
@@ -674,13 +689,13 @@ async def list_files(sandboxId: str):
     """List all files in a sandbox."""
     try:
         # Load environment from database if not in memory
-        logger.info(f"Current sandboxes in memory: {list(sandbox_service.environments.keys())}")
+        logger.info("Current sandboxes in memory: %s", list(sandbox_service.environments.keys()))
         if sandboxId:
-            logger.info(f"Loading sandbox {sandboxId} from database for files")
+            logger.info("Loading sandbox %s from database for files", sandboxId)
             sandbox_doc = await Sandbox.find_one(Sandbox.sandboxId == sandboxId)
-            logger.info(f"Sandbox doc found: {sandbox_doc is not None}")
+            logger.info("Sandbox doc found: %s", sandbox_doc is not None)
             if sandbox_doc:
-                logger.info(f"Sandbox projectPath: {sandbox_doc.projectPath}")
+                logger.info("Sandbox projectPath: %s", sandbox_doc.projectPath)
                 # Use saved port or find a new available port
                 port = sandbox_doc.port
                 if not port:
@@ -699,9 +714,9 @@ async def list_files(sandboxId: str):
                 environment.created_at = sandbox_doc.createdAt
                 environment.last_activity = sandbox_doc.lastActivity
                 sandbox_service.environments[sandboxId] = environment
-                logger.info(f"Created environment for sandbox {sandboxId}")
+                logger.info("Created environment for sandbox %s", sandboxId)
             else:
-                logger.error(f"Sandbox {sandboxId} not found in database")
+                logger.error("Sandbox %s not found in database", sandboxId)
                 raise HTTPException(status_code=404, detail="Sandbox not found")
 
         environment = sandbox_service.environments[sandboxId]
@@ -728,7 +743,7 @@ async def list_files(sandboxId: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to list files: {e}")
+        logger.error("Failed to list files: %s", e)
         raise HTTPException(status_code=500, detail="Failed to list files")
 
 @router.post("/sandbox/{sandbox_id}/stop")
@@ -743,7 +758,7 @@ async def stop_sandbox(sandbox_id: str):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Failed to stop sandbox {sandbox_id}: {e}")
+        logger.error("Failed to stop sandbox %s: %s", sandbox_id, e)
         raise HTTPException(status_code=500, detail="Failed to stop sandbox")
 
 @router.get("/sandbox/{sandbox_id}/context")
@@ -757,27 +772,9 @@ async def get_sandbox_context(sandbox_id: str):
         # Ensure metadata is a dictionary, handle cases where it might be a list or None
         metadata = sandbox.metadata
         if not isinstance(metadata, dict):
-            logger.warning(f"Sandbox {sandbox_id} has invalid metadata type: {type(metadata)}, using empty dict")
+            logger.warning("Sandbox %s has invalid metadata type: %s, using empty dict", sandbox_id, type(metadata))
             metadata = {}
 
-        # Helper function to safely get nested dict values
-        def safe_get(obj, key, default=None):
-            """Safely get a value from a dict, list, or other object."""
-            if isinstance(obj, dict):
-                return obj.get(key, default)
-            return default
-
-        # Helper function to safely get nested values with multiple keys
-        def safe_nested_get(obj, *keys, default=None):
-            """Safely get nested values: safe_nested_get(metadata, 'file_statistics', 'total_files', 0)"""
-            current = obj
-            for key in keys:
-                if isinstance(current, dict):
-                    current = current.get(key, default)
-                else:
-                    return default
-            return current
-
         # Comprehensive context for agents
         context = {
             "sandbox": {
@@ -789,39 +786,41 @@ async def get_sandbox_context(sandbox_id: str):
                 "lastActivity": sandbox.lastActivity.isoformat()
             },
             "project": {
-                "type": safe_get(metadata, "project_type", "unknown"),
-                "frameworks": safe_get(metadata, "frameworks", []),
-                "buildTools": safe_get(metadata, "build_tools", []),
-                "entryPoints": safe_get(metadata, "entry_points", [])
+                "type": metadata.get("project_type", "unknown"),
+                "frameworks": metadata.get("frameworks", []),
+                "buildTools": metadata.get("build_tools", []),
+                "entryPoints": metadata.get("entry_points", [])
             },
             "structure": {
-                "fileCount": safe_nested_get(metadata, "file_statistics", "file_count", 0),
-                "directoryCount": safe_nested_get(metadata, "project_structure", "total_directories", 0),
-                "maxDepth": safe_nested_get(metadata, "project_structure", "max_depth", 0),
-                "topLevelItems": safe_nested_get(metadata, "project_structure", "top_level_items", [])
+                "fileCount": safe_nested_get(metadata, _FILE_COUNT_PATH, 0),
+                "directoryCount": safe_nested_get(metadata, _DIRECTORY_COUNT_PATH, 0),
+                "maxDepth": safe_nested_get(metadata, _MAX_DEPTH_PATH, 0),
+                "topLevelItems": safe_nested_get(metadata, _TOP_LEVEL_ITEMS_PATH, [])
             },
-            "dependencies": safe_get(metadata, "dependencies", {}),
-            "fileTypes": safe_nested_get(metadata, "file_statistics", "file_categories", {}),
+            "dependencies": metadata.get("dependencies", {}),
+            "fileTypes": safe_nested_get(metadata, _FILE_CATEGORIES_PATH, {}),
             "size": {
-                "totalBytes": safe_nested_get(metadata, "size_analysis", "total_size", 0),
-                "formatted": safe_nested_get(metadata, "size_analysis", "total_size_formatted", "0 B"),
-                "largestFiles": safe_nested_get(metadata, "size_analysis", "largest_files", [])
+                "totalBytes": safe_nested_get(metadata, _TOTAL_SIZE_PATH, 0),
+                "formatted": safe_nested_get(metadata, _TOTAL_SIZE_FORMATTED_PATH, "0 B"),
+                "largestFiles": safe_nested_get(metadata, _LARGEST_FILES_PATH, [])
             },
-            "activity": safe_get(metadata, "recent_activity", {}),
-            "fileTree": safe_get(metadata, "file_tree", {}),
-            "generatedAt": safe_get(metadata, "generated_at"),
-            "lastUpdated": safe_get(metadata, "last_updated")
+            "activity": metadata.get("recent_activity", {}),
+            "fileTree": metadata.get("file_tree", {}),
+            "generatedAt": metadata.get("generated_at"),
+            "lastUpdated": metadata.get("last_updated")
         }
 
-        return {
-            "success": True,
-            "context": context
-        }
+        # Encode once and hand back raw JSON so FastAPI skips the recursive
+        # jsonable_encoder pass over the (potentially large) file tree
+        return Response(
+            content=serialize_message({"success": True, "context": context}),
+            media_type="application/json"
+        )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get sandbox context for {sandbox_id}: {e}")
+        logger.error("Failed to get sandbox context for %s: %s", sandbox_id, e)
         raise HTTPException(status_code=500, detail="Failed to get sandbox context")
 
 @router.post("/sandbox/{sandbox_id}/refresh-metadata")
@@ -833,15 +832,18 @@ async def refresh_sandbox_metadata(sandbox_id: str):
         if not sandbox:
             raise HTTPException(status_code=404, detail="Sandbox not found")
         
+        # Snapshot what subscribers last saw so only the changes are broadcast
+        previous_metadata = dict(sandbox.metadata or {})
+
         # Get or create sandbox environment
-        environment = sandbox_service.environments.get(sandbox_id)
-        if not environment:
+        environments = sandbox_service.environments
+        environment = environments.get(sandbox_id)
+        if environment is None:
             # Create a minimal environment for metadata update
-            from app.sandbox_service import SandboxEnvironment
             environment = SandboxEnvironment(sandbox_id, sandbox.name, sandbox.type)
             environment.project_path = sandbox.projectPath or ""
             environment.metadata = sandbox.metadata or {}
-            sandbox_service.environments[sandbox_id] = environment
+            environment = environments.setdefault(sandbox_id, environment)
         
         # Trigger metadata update
         await sandbox_service.update_project_metadata(environment)
@@ -849,30 +851,25 @@ async def refresh_sandbox_metadata(sandbox_id: str):
         # Update database with new metadata
         sandbox.metadata = environment.metadata
         await sandbox.save()
-        
-        # Get updated sandbox data
-        updated_sandbox = await Sandbox.find_one(Sandbox.sandboxId == sandbox_id)
-        
-        # Broadcast update to connected clients
-        await broadcast_sandbox_update("metadata_updated", {
-            "id": updated_sandbox.sandboxId,
-            "name": updated_sandbox.name or "",
-            "type": updated_sandbox.type,
-            "status": updated_sandbox.status,
-            "createdAt": updated_sandbox.createdAt.isoformat(),
-            "lastActivity": updated_sandbox.lastActivity.isoformat(),
-            "metadata": updated_sandbox.metadata
+
+        # Broadcast only the top-level metadata keys that changed; new
+        # subscribers still get the full state in their initial snapshot
+        changes, removed = diff_metadata(previous_metadata, sandbox.metadata)
+        await broadcast_sandbox_update("metadata_delta", {
+            "id": sandbox.sandboxId,
+            "changes": changes,
+            "removed": removed
         })
-        
+
         return {
             "success": True,
             "message": f"Metadata refreshed successfully for sandbox {sandbox_id}",
-            "metadata": updated_sandbox.metadata
+            "metadata": sandbox.metadata
         }
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to refresh metadata for sandbox {sandbox_id}: {e}")
+        logger.error("Failed to refresh metadata for sandbox %s: %s", sandbox_id, e)
         raise HTTPException(status_code=500, detail="Failed to refresh sandbox metadata")
 
 @router.post("/sandbox/stop-others")
@@ -880,17 +877,28 @@ async def stop_other_sandboxes(request: StopOthersRequest):
     """Stop all sandboxes except the specified one."""
     try:
         except_id = request.exceptSandboxId
-        stopped_count = 0
 
-        # Stop all previews except the specified sandbox
-        for sandbox_id, environment in sandbox_service.environments.items():
-            if sandbox_id != except_id and environment.preview:
-                try:
-                    await sandbox_service.stop_preview(sandbox_id)
-                    stopped_count += 1
-                    logger.info(f"Stopped preview for sandbox {sandbox_id}")
-                except Exception as e:
-                    logger.warning(f"Failed to stop preview for sandbox {sandbox_id}: {e}")
+        # Bind the lookups once instead of re-resolving them per sandbox
+        environments = sandbox_service.environments
+        stop_preview = sandbox_service.stop_preview
+
+        # Stop all previews except the specified sandbox, concurrently
+        targets = [
+            sandbox_id for sandbox_id, environment in environments.items()
+            if sandbox_id != except_id and environment.preview
+        ]
+        results = await asyncio.gather(
+            *(stop_preview(sandbox_id) for sandbox_id in targets),
+            return_exceptions=True
+        )
+
+        stopped_count = 0
+        for sandbox_id, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.warning("Failed to stop preview for sandbox %s: %s", sandbox_id, result)
+            else:
+                stopped_count += 1
+                logger.info("Stopped preview for sandbox %s", sandbox_id)
 
         return {
             "success": True,
@@ -899,64 +907,49 @@ async def stop_other_sandboxes(request: StopOthersRequest):
         }
 
     except Exception as e:
-        logger.error(f"Failed to stop other sandboxes: {e}")
+        logger.error("Failed to stop other sandboxes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-# WebSocket connections for real-time updates
-active_websocket_connections: List[WebSocket] = []
+# Pre-encoded reply for application-level pings
+_PONG_FRAME = '{"type":"pong"}'
+
+# Serializes rebuilds of the cached initial frame during reconnect storms
+_initial_snapshot_lock = asyncio.Lock()
 
 async def websocket_sandbox_updates(websocket: WebSocket):
     """WebSocket endpoint for real-time sandbox updates."""
     await websocket.accept()
-    active_websocket_connections.append(websocket)
-    logger.info(f"WebSocket connection established. Total connections: {len(active_websocket_connections)}")
+    active_websocket_connections.add(websocket)
+    logger.info("WebSocket connection established. Total connections: %d", len(active_websocket_connections))
 
     try:
-        # Send initial sandbox list
-        sandboxes_data = await get_all_sandboxes()
-        await websocket.send_json({
-            "type": "initial",
-            "sandboxes": sandboxes_data
-        })
-
-        # Keep connection alive and listen for messages
+        # Send initial sandbox list, sharing one database read and one
+        # serialization across subscribers that connect at the same time
+        async with _initial_snapshot_lock:
+            initial_frame = get_initial_snapshot()
+            if initial_frame is None:
+                sandboxes_data = await get_all_sandboxes()
+                initial_frame = serialize_message({
+                    "type": "initial",
+                    "sandboxes": sandboxes_data
+                })
+                store_initial_snapshot(initial_frame)
+        await websocket.send_text(initial_frame)
+
+        # Keepalive is handled by uvicorn's protocol-level ping/pong frames, so
+        # this loop only wakes up for real client messages or the disconnect
         while True:
-            try:
-                # Wait for any message from client (though we mainly send updates)
-                data = await websocket.receive_text()
-                # Client can send ping messages to keep connection alive
-                if data == "ping":
-                    await websocket.send_json({"type": "pong"})
-            except Exception:
-                # Connection might be closed, break the loop
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
                 break
+            # Legacy clients may still send application-level pings
+            if message.get("text") == "ping":
+                await websocket.send_text(_PONG_FRAME)
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
     finally:
-        if websocket in active_websocket_connections:
-            active_websocket_connections.remove(websocket)
-        logger.info(f"WebSocket connection closed. Total connections: {len(active_websocket_connections)}")
-
-async def broadcast_sandbox_update(update_type: str, sandbox_data: Dict[str, Any]):
-    """Broadcast sandbox update to all connected WebSocket clients."""
-    message = {
-        "type": update_type,
-        "timestamp": datetime.now().isoformat(),
-        "sandbox": sandbox_data
-    }
-
-    disconnected_clients = []
-    for websocket in active_websocket_connections:
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.warning(f"Failed to send update to WebSocket client: {e}")
-            disconnected_clients.append(websocket)
-
-    # Remove disconnected clients
-    for client in disconnected_clients:
-        if client in active_websocket_connections:
-            active_websocket_connections.remove(client)
\ No newline at end of file
+        active_websocket_connections.discard(websocket)
+        logger.info("WebSocket connection closed. Total connections: %d", len(active_websocket_connections))
@@ -1,41 +1,48 @@
 import logging
 from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any, Optional
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Union
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+class VectorSearchRequest(BaseModel):
+    query: str = ""
+    limit: int = 10
+
+class VectorAddRequest(BaseModel):
+    # Documents are added as one batch per request
+    documents: List[Union[str, Dict[str, Any]]] = []
+
 @router.post("/vector/search")
-async def vector_search(data: Dict[str, Any]):
+async def vector_search(request: VectorSearchRequest):
     """Search vector database."""
     try:
-        query = data.get("query", "")
-        limit = data.get("limit", 10)
-
         # TODO: Implement actual vector search
-        # For now, return empty results
-        return {
+        # For now, return empty results. Returned as an ORJSONResponse so FastAPI
+        # skips jsonable_encoder and numpy embeddings serialize without .tolist()
+        return ORJSONResponse({
             "success": True,
             "results": [],
-            "query": query,
+            "query": request.query,
             "total": 0
-        }
+        })
     except Exception as e:
         logger.error(f"Error in vector search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/vector/add")
-async def add_to_vector(data: Dict[str, Any]):
+async def add_to_vector(request: VectorAddRequest):
     """Add documents to vector database."""
     try:
-        documents = data.get("documents", [])
-
         # TODO: Implement actual vector addition
-        return {
+        # ORJSONResponse bypasses jsonable_encoder, as in vector_search
+        return ORJSONResponse({
             "success": True,
-            "added": len(documents)
-        }
+            "added": len(request.documents)
+        })
     except Exception as e:
         logger.error(f"Error adding to vector: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
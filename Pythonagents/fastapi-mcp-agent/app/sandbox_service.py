@@ -1,15 +1,32 @@
 import os
 import asyncio
+import errno
 import logging
-import shutil
 import subprocess
 import tempfile
+import signal
 import socket
-from typing import Dict, Any, Optional, List
+import sys
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable, Tuple
 from pathlib import Path
 from datetime import datetime
 import uuid
 
+from app.utils.fast_rmtree import fast_rmtree, force_rmtree
+from app.utils.sandbox_metadata import generate_sandbox_metadata
+from app.utils.sandbox_templates import (
+    REACT_TEMPLATE, VUE_TEMPLATE, VANILLA_TEMPLATE, react_package_json, write_template
+)
+
+# Database models (unavailable when the Mongo/Beanie stack is not installed)
+try:
+    from beanie.operators import In
+    from app.database import Sandbox
+    DATABASE_AVAILABLE = True
+except ImportError:
+    Sandbox = None
+    DATABASE_AVAILABLE = False
+
 # ChromaDB integration import
 try:
     from app.services.chroma_integration import chroma_integration
@@ -17,28 +34,214 @@ try:
 except ImportError:
     CHROMA_INTEGRATION_AVAILABLE = False
 
+# psutil lists socket owners without shelling out to lsof
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# TCP state code for LISTEN in /proc/net/tcp{,6}
+_PROC_TCP_LISTEN = b'0A'
+
+def _listening_ports_linux() -> Set[int]:
+    """Collect every local port in LISTEN state from one read of /proc/net/tcp and tcp6"""
+    ports: Set[int] = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table, 'rb') as f:
+                lines = f.read().splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) > 3 and fields[3] == _PROC_TCP_LISTEN:
+                ports.add(int(fields[1].rsplit(b':', 1)[1], 16))
+    return ports
+
+def _listening_pids(port: int) -> Set[int]:
+    """PIDs of processes holding a listening TCP socket on the given local port"""
+    if PSUTIL_AVAILABLE:
+        try:
+            return {
+                conn.pid for conn in psutil.net_connections(kind='tcp')
+                if conn.pid and conn.status == psutil.CONN_LISTEN
+                and conn.laddr and conn.laddr.port == port
+            }
+        except psutil.AccessDenied:
+            pass  # macOS needs root for other processes' sockets; lsof does not
+    result = subprocess.run(['lsof', '-ti', f'tcp:{port}', '-sTCP:LISTEN'],
+                            capture_output=True, text=True)
+    return {int(pid) for pid in result.stdout.split() if pid.isdigit()}
+
+# How long a process gets to exit after SIGTERM before SIGKILL
+PROCESS_EXIT_TIMEOUT = 5.0
+
+def _open_pidfd(pid: int) -> Optional[int]:
+    """Pin a process with a pidfd so later signals cannot hit a recycled PID"""
+    if not hasattr(os, 'pidfd_open'):
+        return None
+    try:
+        return os.pidfd_open(pid)
+    except OSError:
+        return None  # Already gone, or kernel older than 5.3
+
+def _signal_pid(pid: int, pidfd: Optional[int], sig: int):
+    if pidfd is not None:
+        signal.pidfd_send_signal(pidfd, sig)
+    else:
+        os.kill(pid, sig)
+
+async def _wait_pid_exit(pid: int, timeout: float, pidfd: Optional[int] = None) -> bool:
+    """Wait for a process to exit; returns False if it is still alive after timeout"""
+    if pidfd is not None:
+        # A pidfd becomes readable the moment the process exits
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await asyncio.wait_for(exited, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(pidfd)
+
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass  # Exists but owned by someone else
+        if asyncio.get_running_loop().time() >= deadline:
+            return False
+        await asyncio.sleep(0.05)
+
+def _process_group_exists(pgid: int) -> bool:
+    """True while a process group has any member, zombies included; a single syscall"""
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists but owned by someone else
+    return True
+
+def _process_group_alive(pgid: int) -> bool:
+    """True while a process group still has a running member.
+
+    Zombies are ignored on Linux: orphans reparented to a PID 1 that never
+    reaps (e.g. uvicorn in a container without an init) would otherwise keep
+    the group looking alive forever, though they hold no sockets. This scans
+    all of /proc, so call it off the event loop.
+    """
+    if not sys.platform.startswith('linux'):
+        return _process_group_exists(pgid)
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry.name}/stat', 'rb') as f:
+                # Fields after the parenthesised command name: state, ppid, pgrp, ...
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != b'Z':
+            return True
+    return False
+
+async def _wait_pgid_empty(pgid: int, timeout: float, leader_pidfd: Optional[int] = None) -> bool:
+    """Wait until no process is left in a process group; False on timeout"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    if leader_pidfd is not None:
+        # The group usually goes down with its leader, so wait for that event first
+        await _wait_pid_exit(pgid, timeout, leader_pidfd)
+    delay = 0.05
+    while True:
+        # The /proc scan only runs while killpg still finds members
+        if not _process_group_exists(pgid) or not await asyncio.to_thread(_process_group_alive, pgid):
+            return True
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
+async def _terminate_pid(pid: int, timeout: float = PROCESS_EXIT_TIMEOUT) -> Dict[str, Any]:
+    """SIGTERM one process, wait for it to exit, and SIGKILL it if it lingers"""
+    result: Dict[str, Any] = {"pid": pid, "success": False, "signal": None, "error": None}
+    pidfd = _open_pidfd(pid)
+    try:
+        _signal_pid(pid, pidfd, signal.SIGTERM)
+        result["signal"] = "SIGTERM"
+        if not await _wait_pid_exit(pid, timeout, pidfd):
+            _signal_pid(pid, pidfd, signal.SIGKILL)
+            result["signal"] = "SIGKILL"
+        result["success"] = True
+    except ProcessLookupError:
+        result["success"] = True  # Already gone
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+    return result
+
+async def _terminate_pids(pids: Set[int], timeout: float = PROCESS_EXIT_TIMEOUT) -> List[Dict[str, Any]]:
+    """Terminate every PID concurrently, returning one result dict per PID"""
+    return await asyncio.gather(*(_terminate_pid(pid, timeout) for pid in pids))
+
+# Directories never walked when indexing a sandbox into ChromaDB
+INDEX_IGNORE_DIRS = frozenset({"node_modules", ".git", "dist", "build", ".next", ".cache", ".vite"})
+
+# Vanilla previews are served by this API process rather than a per-sandbox server
+API_PORT = int(os.getenv("PORT", 8000))
+STATIC_PREVIEW_BASE_URL = f"http://localhost:{API_PORT}/api/preview"
+
+# Install command per package manager; npm skips the audit/funding round trips
+INSTALL_COMMANDS: Dict[str, List[str]] = {
+    "pnpm": ["pnpm", "install"],
+    "yarn": ["yarn", "install"],
+    "npm": ["npm", "install", "--prefer-offline", "--no-audit", "--no-fund"],
+}
+
 class SandboxConfig:
+    __slots__ = ("id", "project_path", "port")
+
     def __init__(self, sandbox_id: str, project_path: str, port: int):
         self.id = sandbox_id
         self.project_path = project_path
         self.port = port
 
 class PreviewConfig:
+    __slots__ = ("url", "port", "status")
+
     def __init__(self, url: str, port: int, status: str = "stopped"):
         self.url = url
         self.port = port
         self.status = status
 
 class SandboxEnvironment:
-    def __init__(self, sandbox_id: str, name: str = None, sandbox_type: str = "react"):
+    __slots__ = (
+        "id", "name", "type", "status", "created_at", "last_activity",
+        "metadata", "config", "preview", "project_path",
+    )
+
+    def __init__(self, sandbox_id: str, name: str = None, sandbox_type: str = "react",
+                 now: Optional[datetime] = None):
         self.id = sandbox_id
         self.name = name
         self.type = sandbox_type
         self.status = "creating"
-        self.created_at = datetime.now()
-        self.last_activity = datetime.now()
+        # One clock read shared by both timestamps (and by the caller, if passed in)
+        now = now or datetime.now()
+        self.created_at = now
+        self.last_activity = now
         self.metadata: Dict[str, Any] = {}
         self.config: Optional[SandboxConfig] = None
         self.preview: Optional[PreviewConfig] = None
@@ -48,17 +251,59 @@ class SandboxService:
     def __init__(self):
         self.base_path = "/Users/Apple/Desktop/NextLovable/sandboxes"
         self.environments: Dict[str, SandboxEnvironment] = {}
-        os.makedirs(self.base_path, exist_ok=True)
-        logger.info(f"SandboxService initialized with base path: {self.base_path}")
+        # Strong references to fire-and-forget tasks so they are not collected mid-run
+        self._background_tasks: Set[asyncio.Task] = set()
+        # Database writes taken off the request path, applied in order by one drain task
+        self._db_writes: asyncio.Queue[Tuple[str, Callable[[], Awaitable[Any]]]] = asyncio.Queue()
+        self._db_writer: Optional[asyncio.Task] = None
+        # Per-sandbox locks so concurrent cache misses share one database load
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        # Ids of sandboxes with a running preview, so stopping the others needs no
+        # database query; seeded once from the database on first use
+        self._running_ids: Set[str] = set()
+        self._running_ids_loaded = False
+        # Static (vanilla) previews served by the API process: sandbox id -> project path
+        self.static_previews: Dict[str, str] = {}
+        # Bound concurrent package installs so parallel sandbox creation cannot thrash the host
+        self._install_semaphore = asyncio.Semaphore(max(2, (os.cpu_count() or 2) // 2))
+        Path(self.base_path).mkdir(parents=True, exist_ok=True)
+        logger.info("SandboxService initialized with base path: %s", self.base_path)
+
+    def _run_in_background(self, coro) -> asyncio.Task:
+        """Schedule a fire-and-forget coroutine, keeping it referenced until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _queue_db_write(self, description: str, write: Callable[[], Awaitable[Any]]):
+        """Apply a database write in the background, after every write queued before it.
+
+        Stop/delete handlers return without waiting on Mongo, while a status
+        write can never overtake an earlier one for the same sandbox.
+        """
+        self._db_writes.put_nowait((description, write))
+        if self._db_writer is None or self._db_writer.done():
+            self._db_writer = self._run_in_background(self._drain_db_writes())
+
+    async def _drain_db_writes(self):
+        while not self._db_writes.empty():
+            description, write = self._db_writes.get_nowait()
+            try:
+                await write()
+            except Exception as e:
+                logger.warning("Failed to %s in database: %s", description, e)
 
     def generate_sandbox_id(self) -> str:
         return f"sandbox_{uuid.uuid4().hex[:16]}"
 
-    def find_available_port(self, start_port: int = 30000, max_port: int = 32000) -> int:
-        for port in range(start_port, max_port + 1):
-            if self.is_port_available(port):
-                return port
-        raise RuntimeError("No available ports found")
+    def find_available_port(self) -> int:
+        """Let the kernel pick a free ephemeral port instead of probing a range"""
+        # No SO_REUSEADDR: it would let the kernel hand out a port that still
+        # has TIME_WAIT connections, which the dev server may then fail to bind
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('localhost', 0))
+            return sock.getsockname()[1]
 
     def is_port_available(self, port: int) -> bool:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -78,16 +323,23 @@ class SandboxService:
             except socket.error:
                 return False
 
+    def is_local_port_listening(self, port: int) -> bool:
+        """Check for a localhost listener, reading the kernel socket table on Linux"""
+        if sys.platform.startswith('linux'):
+            return port in _listening_ports_linux()
+        return self.is_port_listening('localhost', port)
+
     async def create_sandbox(self, name: str = None, sandbox_type: str = "react",
                            template: str = None, enable_preview: bool = False,
                            metadata: Dict[str, Any] = None, session_id: str = None) -> SandboxEnvironment:
 
         sandbox_id = self.generate_sandbox_id()
-        logger.info(f"Creating sandbox {sandbox_id} of type {sandbox_type}")
+        logger.info("Creating sandbox %s of type %s", sandbox_id, sandbox_type)
 
         # Create sandbox directory
-        sandbox_path = os.path.join(self.base_path, sandbox_id)
-        os.makedirs(sandbox_path, exist_ok=True)
+        sandbox_dir = Path(self.base_path) / sandbox_id
+        sandbox_dir.mkdir(parents=True, exist_ok=True)
+        sandbox_path = str(sandbox_dir)
 
         # Find available port
         port = self.find_available_port()
@@ -96,8 +348,9 @@ class SandboxService:
         config = SandboxConfig(sandbox_id, sandbox_path, port)
 
         # Generate comprehensive metadata
+        now = datetime.now()
         generated_metadata = {
-            "created_at": datetime.now().isoformat(),
+            "created_at": now.isoformat(),
             "sandbox_type": sandbox_type,
             "template": template or "default",
             "port": port,
@@ -116,7 +369,7 @@ class SandboxService:
             generated_metadata.update(metadata)
 
         # Create environment
-        environment = SandboxEnvironment(sandbox_id, name, sandbox_type)
+        environment = SandboxEnvironment(sandbox_id, name, sandbox_type, now=now)
         environment.config = config
         environment.project_path = sandbox_path
         environment.metadata = generated_metadata
@@ -129,23 +382,22 @@ class SandboxService:
         await self.initialize_project_structure(environment, template)
         
         # Update metadata with project structure information
-        await self.update_project_metadata(environment)
+        metadata_task = asyncio.create_task(self.update_project_metadata(environment))
 
         # Start preview if requested
         if enable_preview:
-            # Stop all other running previews first
-            await self.stop_all_other_previews(sandbox_id)
+            # Stop all other running previews while the metadata is generated
+            await asyncio.gather(self.stop_all_other_previews(sandbox_id), metadata_task)
             await self.start_preview(sandbox_id)
+        else:
+            await metadata_task
 
-        # Index all sandbox files in ChromaDB (excluding node_modules)
+        # Index all sandbox files in ChromaDB (excluding node_modules) in the
+        # background so the response does not wait on embedding
         if CHROMA_INTEGRATION_AVAILABLE:
-            try:
-                await self.index_sandbox_files(environment)
-                logger.info(f"Successfully indexed sandbox {sandbox_id} files in ChromaDB")
-            except Exception as e:
-                logger.warning(f"Failed to index sandbox {sandbox_id} files in ChromaDB: {e}")
+            self._run_in_background(self._safe_index_sandbox_files(environment))
 
-        logger.info(f"Sandbox {sandbox_id} created successfully")
+        logger.info("Sandbox %s created successfully", sandbox_id)
 
         return environment
 
@@ -160,730 +412,416 @@ class SandboxService:
         else:
             await self.initialize_vanilla_project(environment, template)
 
+    async def _safe_index_sandbox_files(self, environment: SandboxEnvironment):
+        """Background wrapper around index_sandbox_files that logs instead of raising"""
+        try:
+            await self.index_sandbox_files(environment)
+            logger.info("Successfully indexed sandbox %s files in ChromaDB", environment.id)
+        except Exception as e:
+            logger.warning("Failed to index sandbox %s files in ChromaDB: %s", environment.id, e)
+
+    @staticmethod
+    def _index_collection_name(sandbox_id: str) -> str:
+        return f"sandbox_{sandbox_id}"
+
     async def index_sandbox_files(self, environment: SandboxEnvironment):
         """Index all sandbox files in ChromaDB, excluding node_modules"""
         if not CHROMA_INTEGRATION_AVAILABLE or not environment.project_path:
             return
 
         try:
-            # Index the entire sandbox directory, excluding node_modules
-            await chroma_integration.index_directory(
+            # Index the sandbox directory without ever entering dependency or
+            # build output trees; the walk and embedding are blocking, so run
+            # them off the event loop
+            await asyncio.to_thread(
+                chroma_integration.index_directory,
                 environment.project_path,
-                collection_name=f"sandbox_{environment.id}"
+                collection_name=self._index_collection_name(environment.id),
+                ignore_dirs=INDEX_IGNORE_DIRS
             )
-            logger.info(f"Successfully indexed sandbox {environment.id} directory in ChromaDB")
+            logger.info("Successfully indexed sandbox %s directory in ChromaDB", environment.id)
         except Exception as e:
-            logger.error(f"Failed to index sandbox {environment.id} directory: {e}")
+            logger.error("Failed to index sandbox %s directory: %s", environment.id, e)
             raise
 
     async def initialize_react_project(self, environment: SandboxEnvironment, template: str = None):
         """Initialize a React project with Vite"""
-        project_path = environment.project_path
-
-        # Create package.json for Vite + React
-        package_json = {
-            "name": environment.name or environment.id,
-            "version": "0.1.0",
-            "type": "module",
-            "scripts": {
-                "dev": "vite",
-                "start": "vite",
-                "build": "vite build",
-                "preview": "vite preview"
-            },
-            "dependencies": {
-                "react": "^18.2.0",
-                "react-dom": "^18.2.0"
-            },
-            "devDependencies": {
-                "@types/react": "^18.2.0",
-                "@types/react-dom": "^18.2.0",
-                "@vitejs/plugin-react": "^4.0.0",
-                "vite": "^4.3.0"
-            }
-        }
-
-        with open(os.path.join(project_path, "package.json"), "w") as f:
-            import json
-            json.dump(package_json, f, indent=2)
-
-        # Create vite.config.js
-        vite_config = """import { defineConfig } from 'vite'
-import react from '@vitejs/plugin-react'
-
-export default defineConfig({
-  plugins: [react()],
-  server: {
-    host: '0.0.0.0',
-    port: process.env.PORT || 3000
-  }
-})
-"""
-
-        with open(os.path.join(project_path, "vite.config.js"), "w") as f:
-            f.write(vite_config)
-
-        # Create index.html
-        index_html = """<!DOCTYPE html>
-<html lang="en">
-  <head>
-    <meta charset="UTF-8" />
-    <link rel="icon" type="image/svg+xml" href="/vite.svg" />
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <title>React + Vite</title>
-  </head>
-  <body>
-    <div id="root"></div>
-    <script type="module" src="/src/main.jsx"></script>
-  </body>
-</html>
-"""
-
-        with open(os.path.join(project_path, "index.html"), "w") as f:
-            f.write(index_html)
-
-        # Create src directory and files
-        src_path = os.path.join(project_path, "src")
-        os.makedirs(src_path, exist_ok=True)
-
-        # Create src/main.jsx
-        main_jsx = """import React from 'react'
-import ReactDOM from 'react-dom/client'
-import App from './App.jsx'
-import './index.css'
-
-ReactDOM.createRoot(document.getElementById('root')).render(
-  <React.StrictMode>
-    <App />
-  </React.StrictMode>,
-)
-"""
-
-        with open(os.path.join(src_path, "main.jsx"), "w") as f:
-            f.write(main_jsx)
-
-        # Create src/App.jsx
-        app_jsx = """import React, { useState } from 'react'
-import './App.css'
-
-function App() {
-  const [count, setCount] = useState(0)
-
-  return (
-    <div className="App">
-      <header className="App-header">
-        <h1>React + Vite Sandbox</h1>
-        <p>Edit <code>src/App.jsx</code> and save to reload.</p>
-        <div className="card">
-          <button onClick={() => setCount((count) => count + 1)}>
-            count is {count}
-          </button>
-          <p>
-            Edit <code>src/App.jsx</code> and save to test HMR
-          </p>
-        </div>
-      </header>
-    </div>
-  )
-}
-
-export default App
-"""
-
-        with open(os.path.join(src_path, "App.jsx"), "w") as f:
-            f.write(app_jsx)
-
-        # Create src/App.css
-        app_css = """#root {
-  max-width: 1280px;
-  margin: 0 auto;
-  padding: 2rem;
-  text-align: center;
-}
-
-.App {
-  text-align: center;
-}
-
-.App-header {
-  background-color: #f9f9f9;
-  padding: 2rem;
-  border-radius: 8px;
-  margin-bottom: 2rem;
-}
-
-.card {
-  padding: 2em;
-}
-
-button {
-  border-radius: 8px;
-  border: 1px solid transparent;
-  padding: 0.6em 1.2em;
-  font-size: 1em;
-  font-weight: 500;
-  font-family: inherit;
-  background-color: #1a1a1a;
-  color: white;
-  cursor: pointer;
-  transition: border-color 0.25s;
-}
-
-button:hover {
-  border-color: #646cff;
-}
-
-button:focus,
-button:focus-visible {
-  outline: 4px auto -webkit-focus-ring-color;
-}
-"""
-
-        with open(os.path.join(src_path, "App.css"), "w") as f:
-            f.write(app_css)
-
-        # Create src/index.css
-        index_css = """body {
-  margin: 0;
-  display: flex;
-  place-items: center;
-  min-width: 320px;
-  min-height: 100vh;
-}
-
-#root {
-  max-width: 1280px;
-  margin: 0 auto;
-  padding: 2rem;
-  text-align: center;
-}
-
-code {
-  background-color: #f4f4f4;
-  padding: 0.2em 0.4em;
-  border-radius: 4px;
-  font-size: 0.9em;
-}
-"""
-
-        with open(os.path.join(src_path, "index.css"), "w") as f:
-            f.write(index_css)
+        files = [("package.json", react_package_json(environment.name or environment.id))] + REACT_TEMPLATE
+        await asyncio.to_thread(write_template, environment.project_path, files)
 
     async def initialize_vue_project(self, environment: SandboxEnvironment, template: str = None):
         """Initialize a Vue project with Vite"""
-        project_path = environment.project_path
-
-        # Create package.json for Vue + Vite
-        package_json = {
-            "name": "vue-sandbox",
-            "private": True,
-            "version": "0.0.0",
-            "type": "module",
-            "scripts": {
-                "dev": "vite",
-                "start": "vite",
-                "build": "vite build",
-                "preview": "vite preview"
-            },
-            "dependencies": {
-                "vue": "^3.4.0"
-            },
-            "devDependencies": {
-                "@vitejs/plugin-vue": "^5.0.0",
-                "vite": "^5.0.0"
-            }
-        }
-
-        with open(os.path.join(project_path, "package.json"), "w") as f:
-            import json
-            json.dump(package_json, f, indent=2)
-
-        # Create vite.config.js
-        vite_config = """import { defineConfig } from 'vite'
-import vue from '@vitejs/plugin-vue'
-
-export default defineConfig({
-  plugins: [vue()],
-  server: {
-    host: '0.0.0.0',
-    port: process.env.PORT || 3000
-  }
-})
-"""
-
-        with open(os.path.join(project_path, "vite.config.js"), "w") as f:
-            f.write(vite_config)
-
-        # Create index.html
-        index_html = """<!DOCTYPE html>
-<html lang="en">
-  <head>
-    <meta charset="UTF-8" />
-    <link rel="icon" type="image/svg+xml" href="/vite.svg" />
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <title>Vue + Vite</title>
-  </head>
-  <body>
-    <div id="app"></div>
-    <script type="module" src="/src/main.js"></script>
-  </body>
-</html>
-"""
-
-        with open(os.path.join(project_path, "index.html"), "w") as f:
-            f.write(index_html)
-
-        # Create src directory and files
-        src_path = os.path.join(project_path, "src")
-        os.makedirs(src_path, exist_ok=True)
-
-        # Create src/main.js
-        main_js = """import { createApp } from 'vue'
-import App from './App.vue'
-
-createApp(App).mount('#app')
-"""
-
-        with open(os.path.join(src_path, "main.js"), "w") as f:
-            f.write(main_js)
-
-        # Create src/App.vue
-        app_vue = """<template>
-  <div id="app">
-    <h1>Vue + Vite Sandbox</h1>
-    <p>Edit <code>src/App.vue</code> and save to reload.</p>
-    <div class="card">
-      <button @click="count++">count is {{ count }}</button>
-      <p>
-        Edit <code>src/App.vue</code> and save to test HMR
-      </p>
-    </div>
-  </div>
-</template>
-
-<script>
-export default {
-  name: 'App',
-  data() {
-    return {
-      count: 0
-    }
-  }
-}
-</script>
-
-<style scoped>
-#app {
-  font-family: Avenir, Helvetica, Arial, sans-serif;
-  -webkit-font-smoothing: antialiased;
-  -moz-osx-font-smoothing: grayscale;
-  text-align: center;
-  color: #2c3e50;
-  margin-top: 60px;
-}
-
-.card {
-  padding: 2em;
-}
+        await asyncio.to_thread(write_template, environment.project_path, VUE_TEMPLATE)
 
-button {
-  font-size: 1em;
-  padding: 0.6em 1.2em;
-  border: 1px solid #646cff;
-  border-radius: 8px;
-  background-color: #f9f9f9;
-  cursor: pointer;
-  transition: border-color 0.25s;
-}
+    async def initialize_vanilla_project(self, environment: SandboxEnvironment, template: str = None):
+        """Initialize a vanilla JavaScript project"""
+        await asyncio.to_thread(write_template, environment.project_path, VANILLA_TEMPLATE)
 
-button:hover {
-  border-color: #646cff;
-}
-</style>
-"""
-
-        with open(os.path.join(src_path, "App.vue"), "w") as f:
-            f.write(app_vue)
-
-        # Create src/index.css
-        index_css = """body {
-  margin: 0;
-  display: flex;
-  place-items: center;
-  min-width: 320px;
-  min-height: 100vh;
-}
+    def _require_environment(self, sandbox_id: str) -> SandboxEnvironment:
+        """Return the in-memory environment for a sandbox, or raise ValueError"""
+        environment = self.environments.get(sandbox_id)
+        if environment is None:
+            raise ValueError(f"Sandbox {sandbox_id} not found")
+        return environment
 
-#app {
-  max-width: 1280px;
-  margin: 0 auto;
-  padding: 2rem;
-  text-align: center;
-}
-"""
+    async def _load_environment(self, sandbox_id: str, doc: Optional["Sandbox"] = None) -> SandboxEnvironment:
+        """Return the environment for a sandbox, rebuilding it from the database on a miss.
 
-        with open(os.path.join(src_path, "index.css"), "w") as f:
-            f.write(index_css)
+        Concurrent callers for the same id (a double-clicked delete) wait on one
+        lock, so only the first queries Mongo and they all get the same object.
+        """
+        environment = self.environments.get(sandbox_id)
+        if environment is not None:
+            return environment
 
-    async def initialize_vanilla_project(self, environment: SandboxEnvironment, template: str = None):
-        """Initialize a vanilla JavaScript project"""
-        project_path = environment.project_path
-
-        # Create basic HTML structure
-        index_html = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Vanilla JS App</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #f0f0f0;
-        }
-        .container {
-            max-width: 800px;
-            margin: 0 auto;
-            background: white;
-            padding: 20px;
-            border-radius: 8px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #333;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Hello, World!</h1>
-        <p>This is a vanilla JavaScript application.</p>
-        <div id="app"></div>
-    </div>
-    <script src="script.js"></script>
-</body>
-</html>"""
-
-        with open(os.path.join(project_path, "index.html"), "w") as f:
-            f.write(index_html)
-
-        # Create basic JavaScript file
-        script_js = """// Vanilla JavaScript Application
-document.addEventListener('DOMContentLoaded', function() {
-    const app = document.getElementById('app');
-
-    // Create a simple interactive element
-    const button = document.createElement('button');
-    button.textContent = 'Click me!';
-    button.style.padding = '10px 20px';
-    button.style.backgroundColor = '#007bff';
-    button.style.color = 'white';
-    button.style.border = 'none';
-    button.style.borderRadius = '4px';
-    button.style.cursor = 'pointer';
-
-    let clickCount = 0;
-    button.addEventListener('click', function() {
-        clickCount++;
-        const message = document.createElement('p');
-        message.textContent = `Button clicked ${clickCount} time(s)!`;
-        message.style.marginTop = '10px';
-        app.appendChild(message);
-    });
-
-    app.appendChild(button);
-});"""
-
-        with open(os.path.join(project_path, "script.js"), "w") as f:
-            f.write(script_js)
+        lock = self._load_locks.setdefault(sandbox_id, asyncio.Lock())
+        try:
+            async with lock:
+                environment = self.environments.get(sandbox_id)
+                if environment is not None:
+                    return environment
+                try:
+                    sandbox_doc = doc or await Sandbox.find_one(Sandbox.sandboxId == sandbox_id)
+                    if not sandbox_doc:
+                        raise ValueError(f"Sandbox {sandbox_id} not found in database")
+                    # Create a minimal environment for stopping or deleting
+                    environment = SandboxEnvironment(sandbox_id, sandbox_doc.name, sandbox_doc.type)
+                    environment.status = sandbox_doc.status
+                    environment.project_path = sandbox_doc.projectPath
+                    environment.metadata = sandbox_doc.metadata or {}
+                    if sandbox_doc.port:
+                        environment.config = SandboxConfig(sandbox_id, sandbox_doc.projectPath or "", sandbox_doc.port)
+                except Exception as e:
+                    logger.error("Failed to load sandbox %s from database: %s", sandbox_id, e)
+                    raise ValueError(f"Sandbox {sandbox_id} not found")
+                # Add to environments for future reference
+                self.environments[sandbox_id] = environment
+                return environment
+        finally:
+            self._load_locks.pop(sandbox_id, None)
 
     async def start_preview(self, sandbox_id: str) -> PreviewConfig:
         """Start preview for a sandbox"""
-        if sandbox_id not in self.environments:
-            raise ValueError(f"Sandbox {sandbox_id} not found")
-
-        environment = self.environments[sandbox_id]
+        environment = self._require_environment(sandbox_id)
 
         if not environment.config:
             raise ValueError(f"Sandbox {sandbox_id} has no configuration")
 
-        # Check if the configured port is available, if not find a new one with retry logic
+        if environment.type not in ["react", "vue"]:
+            return await self._start_static_preview(environment)
+
+        # Keep the configured port if it is still free; a freshly assigned port
+        # is free by construction, so it needs no second bind test
         port = environment.config.port
-        max_retries = 10
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                if not self.is_port_available(port):
-                    logger.info(f"Port {port} is not available for {sandbox_id}, trying new port (attempt {retry_count + 1})")
-                    port = self.find_available_port()
-                    # Update the config with the new port
-                    environment.config.port = port
-                    retry_count += 1
-                    continue
-                
-                # Try to start the server to see if port is really available
-                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                test_socket.bind(('localhost', port))
-                test_socket.close()
-                break  # Port is available, break out of retry loop
-                
-            except OSError as e:
-                if e.errno == 48:  # Address already in use
-                    logger.warning(f"Port {port} already in use (errno 48) for {sandbox_id}, trying new port (attempt {retry_count + 1})")
-                    port = self.find_available_port()
-                    environment.config.port = port
-                    retry_count += 1
-                else:
-                    raise  # Re-raise other OSError types
-        
-        if retry_count >= max_retries:
-            raise Exception(f"Failed to find available port for sandbox {sandbox_id} after {max_retries} attempts")
+        if not self.is_port_available(port):
+            logger.info("Port %s is not available for %s, assigning a new port", port, sandbox_id)
+            port = self.find_available_port()
+            environment.config.port = port
 
         project_path = environment.config.project_path
         preview = PreviewConfig(f"http://localhost:{port}", port, "running")
         environment.preview = preview
         environment.status = "running"
+        self._running_ids.add(sandbox_id)
 
         # Update status in database
-        try:
-            from app.database import Sandbox
-            await Sandbox.find_one(Sandbox.sandboxId == sandbox_id).update({"$set": {"status": "running", "port": port}})
-        except Exception as e:
-            logger.warning(f"Failed to update sandbox status in database: {e}")
+        self._queue_db_write("update sandbox status", lambda: Sandbox.find_one(Sandbox.sandboxId == sandbox_id).update(
+            {"$set": {"status": "running", "port": port}}
+        ))
 
-        # Install dependencies and start the development server
-        import subprocess
-        import threading
-
-        def start_dev_server():
-            try:
-                os.chdir(project_path)
-                
-                # Install dependencies
-                logger.info(f"Installing dependencies for {sandbox_id}")
-                install_success = False
-                
-                # Try pnpm first if lockfile exists
-                if os.path.exists("pnpm-lock.yaml"):
-                    try:
-                        result = subprocess.run(["pnpm", "install"], check=True, capture_output=True, text=True, timeout=300)
-                        logger.info(f"Successfully installed dependencies with pnpm for {sandbox_id}")
-                        install_success = True
-                    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                        logger.warning(f"pnpm install failed for {sandbox_id}: {e}")
-                
-                # Try yarn if no pnpm lockfile or pnpm failed
-                if not install_success and os.path.exists("yarn.lock"):
-                    try:
-                        result = subprocess.run(["yarn", "install"], check=True, capture_output=True, text=True, timeout=300)
-                        logger.info(f"Successfully installed dependencies with yarn for {sandbox_id}")
-                        install_success = True
-                    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                        logger.warning(f"yarn install failed for {sandbox_id}: {e}")
-                
-                # Fall back to npm
-                if not install_success:
-                    try:
-                        result = subprocess.run(["pnpm", "install"], check=True, capture_output=True, text=True, timeout=300)
-                        logger.info(f"Successfully installed dependencies with npm for {sandbox_id}")
-                        install_success = True
-                    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                        logger.error(f"npm install failed for {sandbox_id}: {e}")
-                        logger.error(f"stdout: {e.stdout}")
-                        logger.error(f"stderr: {e.stderr}")
-                        raise Exception(f"Failed to install dependencies: {e}")
-                
-                if not install_success:
-                    raise Exception("All package managers failed to install dependencies")
-                
-                # Start development server
-                logger.info(f"Starting development server for {sandbox_id} on port {port}")
-                if environment.type in ["react", "vue"]:
-                    # For React and Vue, use the start script which should be configured to use the right port
-                    env = os.environ.copy()
-                    env["PORT"] = str(port)
-                    # Use Popen to start asynchronously
-                    process = subprocess.Popen(["pnpm", "start"], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    logger.info(f"Started {environment.type} dev server for {sandbox_id} with PID {process.pid}")
-                    # Store the process for later cleanup
-                    environment.metadata["dev_server_pid"] = process.pid
-                else:
-                    # For other types, start a simple HTTP server
-                    import http.server
-                    import socketserver
-                    handler = http.server.SimpleHTTPRequestHandler
-                    with socketserver.TCPServer(("", port), handler) as httpd:
-                        logger.info(f"Serving {sandbox_id} on port {port}")
-                        httpd.serve_forever()
-                        
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to start dev server for {sandbox_id}: {e}")
-                logger.error(f"stdout: {e.stdout}")
-                logger.error(f"stderr: {e.stderr}")
-            except Exception as e:
-                logger.error(f"Failed to start preview server for {sandbox_id}: {e}")
-
-        server_thread = threading.Thread(target=start_dev_server, daemon=True)
-        server_thread.start()
+        # Install dependencies and start the development server in the
+        # background while the port is polled below
+        self._run_in_background(self._start_dev_server(environment, project_path, port))
 
         # Wait for the server to be ready by polling the port
-        logger.info(f"Waiting for development server to be ready on port {port}")
+        logger.info("Waiting for development server to be ready on port %s", port)
         max_wait_time = 60  # seconds - increased from 30
         wait_start = asyncio.get_event_loop().time()
         
         while asyncio.get_event_loop().time() - wait_start < max_wait_time:
-            if self.is_port_listening('localhost', port):
-                logger.info(f"Development server is ready on port {port} for sandbox {sandbox_id}")
+            if self.is_local_port_listening(port):
+                logger.info("Development server is ready on port %s for sandbox %s", port, sandbox_id)
                 break
             await asyncio.sleep(0.5)  # Check every 500ms
         else:
-            logger.warning(f"Development server for sandbox {sandbox_id} did not become ready within {max_wait_time} seconds")
+            logger.warning("Development server for sandbox %s did not become ready within %s seconds", sandbox_id, max_wait_time)
 
-        logger.info(f"Started preview for sandbox {sandbox_id} on port {port}")
+        logger.info("Started preview for sandbox %s on port %s", sandbox_id, port)
         return preview
 
+    async def _start_static_preview(self, environment: SandboxEnvironment) -> PreviewConfig:
+        """Serve a static (vanilla) sandbox from the API's shared preview route.
+
+        No process or port is needed per sandbox: the files are served by the
+        API process itself, so the preview is ready as soon as it is registered.
+        """
+        sandbox_id = environment.id
+        self.static_previews[sandbox_id] = environment.config.project_path
+        preview = PreviewConfig(f"{STATIC_PREVIEW_BASE_URL}/{sandbox_id}/", API_PORT, "running")
+        environment.preview = preview
+        environment.status = "running"
+        self._running_ids.add(sandbox_id)
+
+        # Update status in database
+        self._queue_db_write("update sandbox status", lambda: Sandbox.find_one(Sandbox.sandboxId == sandbox_id).update(
+            {"$set": {"status": "running"}}
+        ))
+
+        logger.info("Serving static preview for sandbox %s at %s", sandbox_id, preview.url)
+        return preview
+
+    async def _run_install(self, command: List[str], project_path: str):
+        """Run a package manager install in project_path, bounded by the install semaphore"""
+        async with self._install_semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=project_path,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise subprocess.TimeoutExpired(command, 300)
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, command,
+                stdout.decode(errors="replace"), stderr.decode(errors="replace")
+            )
+
+    def _resolve_package_managers(self, project_path: str) -> List[str]:
+        """Package managers to try, in order, based on which lockfiles are present"""
+        root = Path(project_path)
+        managers = []
+        if (root / "pnpm-lock.yaml").exists():
+            managers.append("pnpm")
+        if (root / "yarn.lock").exists():
+            managers.append("yarn")
+        managers.append("npm")
+        return managers
+
+    async def _install_dependencies(self, environment: SandboxEnvironment, project_path: str) -> str:
+        """Install dependencies and return the package manager that succeeded.
+
+        The first manager that works is cached in the sandbox metadata so
+        restarts go straight to it instead of re-probing lockfiles.
+        """
+        sandbox_id = environment.id
+        logger.info("Installing dependencies for %s", sandbox_id)
+
+        cached = environment.metadata.get("pkg_mgr")
+        managers = [cached] if cached in INSTALL_COMMANDS else self._resolve_package_managers(project_path)
+
+        last_error = None
+        for manager in managers:
+            try:
+                await self._run_install(INSTALL_COMMANDS[manager], project_path)
+                logger.info("Successfully installed dependencies with %s for %s", manager, sandbox_id)
+                environment.metadata["pkg_mgr"] = manager
+                return manager
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                logger.warning("%s install failed for %s: %s", manager, sandbox_id, e)
+                if isinstance(e, subprocess.CalledProcessError):
+                    logger.debug("stderr: %s", e.stderr)
+                last_error = e
+
+        if cached:
+            # The cached manager stopped working; probe again from scratch
+            del environment.metadata["pkg_mgr"]
+            return await self._install_dependencies(environment, project_path)
+
+        raise Exception(f"Failed to install dependencies: {last_error}")
+
+    async def _start_dev_server(self, environment: SandboxEnvironment, project_path: str, port: int):
+        """Install dependencies and launch the preview server process for a sandbox"""
+        sandbox_id = environment.id
+        try:
+            package_manager = "npm"
+            if (Path(project_path) / "package.json").exists():
+                package_manager = await self._install_dependencies(environment, project_path)
+
+            logger.info("Starting development server for %s on port %s", sandbox_id, port)
+            # The start script is configured to use the port passed in PORT
+            env = os.environ.copy()
+            env["PORT"] = str(port)
+
+            # Output is discarded: an unread pipe would eventually stall the server
+            process = await asyncio.create_subprocess_exec(
+                package_manager, "start", cwd=project_path, env=env,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                # Own process group, so stopping it also stops the node process
+                # the package manager spawns
+                start_new_session=True
+            )
+            logger.info("Started %s dev server for %s with PID %s", environment.type, sandbox_id, process.pid)
+            # Store the process and its group for later cleanup; with a new
+            # session the group id is the leader's pid
+            environment.metadata["dev_server_pid"] = process.pid
+            environment.metadata["dev_server_pgid"] = process.pid
+
+        except Exception as e:
+            logger.error("Failed to start preview server for %s: %s", sandbox_id, e)
+
     async def get_preview(self, sandbox_id: str) -> Optional[PreviewConfig]:
         """Get preview configuration for a sandbox"""
-        if sandbox_id not in self.environments:
-            return None
+        environment = self.environments.get(sandbox_id)
+        return environment.preview if environment else None
+
+    async def _kill_dev_server(self, environment: SandboxEnvironment, sandbox_id: str):
+        """Terminate the dev server's process group, escalating to SIGKILL if it lingers"""
+        pid = environment.metadata.get("dev_server_pid")
+        pgid = environment.metadata.get("dev_server_pgid")
+        if not pid and not pgid:
+            return
 
-        environment = self.environments[sandbox_id]
-        return environment.preview
+        try:
+            if not pgid:
+                # Servers started before the group id was recorded
+                pgid = os.getpgid(pid)
+            if pgid == os.getpgrp():
+                # Not started in its own session; never signal our own group
+                await _terminate_pid(pid)
+            else:
+                # The group outlives its leader, so children that kept the
+                # port are reached even if the package manager already exited
+                pidfd = _open_pidfd(pid) if pid else None
+                try:
+                    os.killpg(pgid, signal.SIGTERM)
+                    if not await _wait_pgid_empty(pgid, PROCESS_EXIT_TIMEOUT, pidfd):
+                        os.killpg(pgid, signal.SIGKILL)
+                finally:
+                    if pidfd is not None:
+                        os.close(pidfd)
+            logger.info("Killed dev server process %s for sandbox %s", pid or pgid, sandbox_id)
+        except ProcessLookupError:
+            logger.warning("Process %s not found for sandbox %s", pid or pgid, sandbox_id)
+        except Exception as e:
+            logger.error("Failed to kill dev server process for sandbox %s: %s", sandbox_id, e)
+            return
+        environment.metadata.pop("dev_server_pid", None)
+        environment.metadata.pop("dev_server_pgid", None)
 
     async def stop_preview(self, sandbox_id: str):
         """Stop preview for a sandbox"""
-        if sandbox_id not in self.environments:
-            raise ValueError(f"Sandbox {sandbox_id} not found")
-
-        environment = self.environments[sandbox_id]
+        environment = self._require_environment(sandbox_id)
         if environment.preview:
-            # Kill the development server process if it exists
-            if "dev_server_pid" in environment.metadata:
-                try:
-                    import signal
-                    os.kill(environment.metadata["dev_server_pid"], signal.SIGTERM)
-                    logger.info(f"Killed dev server process {environment.metadata['dev_server_pid']} for sandbox {sandbox_id}")
-                    del environment.metadata["dev_server_pid"]
-                except ProcessLookupError:
-                    logger.warning(f"Process {environment.metadata['dev_server_pid']} not found for sandbox {sandbox_id}")
-                except Exception as e:
-                    logger.error(f"Failed to kill dev server process for sandbox {sandbox_id}: {e}")
+            self.static_previews.pop(sandbox_id, None)
+            # Kill the development server and everything it spawned
+            await self._kill_dev_server(environment, sandbox_id)
             
             # Wait for port to be freed
             if environment.config and environment.config.port:
                 await self.wait_for_port_free(environment.config.port, sandbox_id)
             
             environment.preview.status = "stopped"
-            logger.info(f"Stopped preview for sandbox {sandbox_id}")
+            self._running_ids.discard(sandbox_id)
+            logger.info("Stopped preview for sandbox %s", sandbox_id)
         else:
-            logger.warning(f"No preview running for sandbox {sandbox_id}")
+            logger.warning("No preview running for sandbox %s", sandbox_id)
 
     async def wait_for_port_free(self, port: int, sandbox_id: str, timeout: int = 10):
         """Wait for a port to be freed after stopping processes"""
-        logger.info(f"Waiting for port {port} to be freed for sandbox {sandbox_id}")
+        logger.info("Waiting for port %s to be freed for sandbox %s", port, sandbox_id)
         start_time = asyncio.get_event_loop().time()
         
         while asyncio.get_event_loop().time() - start_time < timeout:
-            if not self.is_port_listening('localhost', port):
-                logger.info(f"Port {port} is now free for sandbox {sandbox_id}")
+            if not self.is_local_port_listening(port):
+                logger.info("Port %s is now free for sandbox %s", port, sandbox_id)
                 return
-            await asyncio.sleep(0.5)
+            # Each probe is a single socket-table read, so poll tightly
+            await asyncio.sleep(0.1)
         
-        logger.warning(f"Port {port} did not become free within {timeout} seconds for sandbox {sandbox_id}")
+        logger.warning("Port %s did not become free within %s seconds for sandbox %s", port, timeout, sandbox_id)
 
     async def stop_all_other_previews(self, except_sandbox_id: str):
         """Stop all previews except for the specified sandbox"""
         stopped_count = 0
-        logger.info(f"Stopping all other sandboxes except {except_sandbox_id}")
+        logger.info("Stopping all other sandboxes except %s", except_sandbox_id)
         
         try:
-            from app.database import Sandbox
-            # Find all running sandboxes except the current one
-            running_sandboxes = await Sandbox.find(Sandbox.status == "running", Sandbox.sandboxId != except_sandbox_id).to_list()
-            
-            for sandbox in running_sandboxes:
-                try:
-                    logger.info(f"Stopping sandbox {sandbox.sandboxId} completely")
-                    await self.stop_sandbox(sandbox.sandboxId)
-                    stopped_count += 1
-                    logger.info(f"Stopped sandbox {sandbox.sandboxId} to allow new sandbox {except_sandbox_id}")
-                except Exception as e:
-                    logger.warning(f"Failed to stop sandbox {sandbox.sandboxId}: {e}")
+            preloaded = {}
+            if not self._running_ids_loaded:
+                # Previews started before this process came up are only known to
+                # the database, so pick them up once
+                running_sandboxes = await Sandbox.find(Sandbox.status == "running").to_list()
+                preloaded = {sandbox.sandboxId: sandbox for sandbox in running_sandboxes}
+                self._running_ids.update(preloaded)
+                self._running_ids_loaded = True
+
+            sandbox_ids = [sandbox_id for sandbox_id in self._running_ids if sandbox_id != except_sandbox_id]
+
+            # Stop them concurrently so the port-free waits overlap instead of adding up;
+            # fetched documents are handed over so no sandbox is looked up twice
+            results = await asyncio.gather(
+                *(self.stop_sandbox(sandbox_id, update_database=False, doc=preloaded.get(sandbox_id))
+                  for sandbox_id in sandbox_ids),
+                return_exceptions=True
+            )
+
+            stopped_ids = []
+            for sandbox_id, result in zip(sandbox_ids, results):
+                if isinstance(result, Exception):
+                    logger.warning("Failed to stop sandbox %s: %s", sandbox_id, result)
+                    # Usually a sandbox that no longer exists; don't retry it on every create
+                    self._running_ids.discard(sandbox_id)
+                else:
+                    stopped_ids.append(sandbox_id)
+                    logger.info("Stopped sandbox %s to allow new sandbox %s", sandbox_id, except_sandbox_id)
+            stopped_count = len(stopped_ids)
+
+            # Record every stop in a single update, off the critical path
+            if stopped_ids:
+                self._queue_db_write("update sandbox status", lambda: self._mark_sandboxes_stopped(stopped_ids))
         
         except Exception as e:
-            logger.error(f"Error stopping other sandboxes: {e}")
+            logger.error("Error stopping other sandboxes: %s", e)
         
         if stopped_count > 0:
-            logger.info(f"Stopped {stopped_count} other sandboxes for {except_sandbox_id}")
+            logger.info("Stopped %s other sandboxes for %s", stopped_count, except_sandbox_id)
         else:
-            logger.info(f"No other sandboxes were stopped for {except_sandbox_id}")
+            logger.info("No other sandboxes were stopped for %s", except_sandbox_id)
 
-    async def stop_sandbox(self, sandbox_id: str):
-        """Stop a sandbox (stop processes but keep files)"""
-        environment = None
-        
-        # Try to get environment from memory first
-        if sandbox_id in self.environments:
-            environment = self.environments[sandbox_id]
-        else:
-            # If not in memory, try to load from database
-            try:
-                from app.database import Sandbox
-                sandbox_doc = await Sandbox.find_one(Sandbox.sandboxId == sandbox_id)
-                if sandbox_doc:
-                    # Create a minimal environment for stopping
-                    environment = SandboxEnvironment(sandbox_id, sandbox_doc.name, sandbox_doc.type)
-                    environment.status = sandbox_doc.status
-                    environment.metadata = sandbox_doc.metadata or {}
-                    if sandbox_doc.port:
-                        environment.config = SandboxConfig(sandbox_id, sandbox_doc.projectPath or "", sandbox_doc.port)
-                    # Add to environments for future reference
-                    self.environments[sandbox_id] = environment
-                else:
-                    raise ValueError(f"Sandbox {sandbox_id} not found in database")
-            except Exception as e:
-                logger.error(f"Failed to load sandbox {sandbox_id} from database: {e}")
-                raise ValueError(f"Sandbox {sandbox_id} not found")
+    async def _mark_sandboxes_stopped(self, sandbox_ids: List[str]):
+        """Persist the stopped status for several sandboxes in one update"""
+        await Sandbox.find(In(Sandbox.sandboxId, sandbox_ids)).update(
+            {"$set": {"status": "stopped", "lastActivity": datetime.utcnow()}}
+        )
+
+    async def stop_sandbox(self, sandbox_id: str, update_database: bool = True, doc: Optional["Sandbox"] = None):
+        """Stop a sandbox (stop processes but keep files).
+
+        Callers stopping many sandboxes can pass update_database=False and
+        record the new status in one bulk update instead, and pass the
+        already-fetched document as doc to skip the per-sandbox lookup.
+        """
+        environment = await self._load_environment(sandbox_id, doc)
 
         # Stop preview if running
         if environment.preview and environment.preview.status == "running":
             await self.stop_preview(sandbox_id)
 
         # Kill any other running processes associated with this sandbox
-        if "dev_server_pid" in environment.metadata:
-            try:
-                import signal
-                os.kill(environment.metadata["dev_server_pid"], signal.SIGTERM)
-                logger.info(f"Killed dev server process {environment.metadata['dev_server_pid']} for sandbox {sandbox_id}")
-                del environment.metadata["dev_server_pid"]
-            except ProcessLookupError:
-                logger.warning(f"Process {environment.metadata['dev_server_pid']} not found for sandbox {sandbox_id}")
-            except Exception as e:
-                logger.error(f"Failed to kill dev server process for sandbox {sandbox_id}: {e}")
+        self.static_previews.pop(sandbox_id, None)
+        await self._kill_dev_server(environment, sandbox_id)
 
-        # Kill any processes that might be using the sandbox port
+        # Kill any processes still listening on the sandbox port
         if environment.config and environment.config.port:
+            port = environment.config.port
             try:
-                import subprocess
-                # Find processes using the port
-                result = subprocess.run(['lsof', '-ti', f':{environment.config.port}'], 
-                                      capture_output=True, text=True)
-                if result.returncode == 0 and result.stdout.strip():
-                    pids = result.stdout.strip().split('\n')
-                    for pid in pids:
-                        try:
-                            os.kill(int(pid), signal.SIGTERM)
-                            logger.info(f"Killed process {pid} using port {environment.config.port} for sandbox {sandbox_id}")
-                        except (ProcessLookupError, ValueError):
-                            pass  # Process might not exist
-                        except Exception as e:
-                            logger.error(f"Failed to kill process {pid}: {e}")
+                # Usually killing the dev server's group already freed the port
+                pids = set()
+                if self.is_local_port_listening(port):
+                    pids = await asyncio.to_thread(_listening_pids, port)
+                pids.discard(os.getpid())
+                for result in await _terminate_pids(pids):
+                    if result["error"]:
+                        logger.error("Failed to kill process %s: %s", result["pid"], result["error"])
+                    elif result["signal"]:
+                        logger.info("Killed process %s (%s) using port %s for sandbox %s",
+                                    result["pid"], result["signal"], port, sandbox_id)
             except Exception as e:
-                logger.warning(f"Failed to find/kill processes using port {environment.config.port}: {e}")
+                logger.warning("Failed to find/kill processes using port %s: %s", port, e)
 
         # Wait for port to be freed
         if environment.config and environment.config.port:
@@ -891,94 +829,62 @@ document.addEventListener('DOMContentLoaded', function() {
 
         # Mark sandbox as stopped
         environment.status = "stopped"
+        self._running_ids.discard(sandbox_id)
         
         # Update status in database
-        try:
-            from app.database import Sandbox
-            await Sandbox.find_one(Sandbox.sandboxId == sandbox_id).update({"$set": {"status": "stopped", "lastActivity": datetime.utcnow()}})
-        except Exception as e:
-            logger.warning(f"Failed to update sandbox status in database: {e}")
+        if update_database:
+            stopped_at = datetime.utcnow()
+            self._queue_db_write("update sandbox status", lambda: Sandbox.find_one(Sandbox.sandboxId == sandbox_id).update(
+                {"$set": {"status": "stopped", "lastActivity": stopped_at}}
+            ))
         
-        logger.info(f"Stopped sandbox {sandbox_id}")
+        logger.info("Stopped sandbox %s", sandbox_id)
+
+    async def _delete_sandbox_document(self, sandbox_id: str):
+        await Sandbox.find_one(Sandbox.sandboxId == sandbox_id).delete()
+        logger.info("Deleted sandbox %s from database", sandbox_id)
 
     async def delete_sandbox(self, sandbox_id: str):
         """Delete a sandbox"""
-        environment = None
-        
-        # Try to get environment from memory first
-        if sandbox_id in self.environments:
-            environment = self.environments[sandbox_id]
-        else:
-            # If not in memory, try to load from database
-            try:
-                from app.database import Sandbox
-                sandbox_doc = await Sandbox.find_one(Sandbox.sandboxId == sandbox_id)
-                if sandbox_doc:
-                    # Create a minimal environment for deletion
-                    from app.sandbox_service import SandboxEnvironment, SandboxConfig
-                    environment = SandboxEnvironment(sandbox_id, sandbox_doc.name, sandbox_doc.type)
-                    environment.project_path = sandbox_doc.projectPath
-                    environment.metadata = sandbox_doc.metadata or {}
-                    if sandbox_doc.port:
-                        environment.config = SandboxConfig(sandbox_id, sandbox_doc.projectPath or "", sandbox_doc.port)
-                    # Add to environments for future reference
-                    self.environments[sandbox_id] = environment
-                else:
-                    raise ValueError(f"Sandbox {sandbox_id} not found in database")
-            except Exception as e:
-                logger.error(f"Failed to load sandbox {sandbox_id} from database: {e}")
-                raise ValueError(f"Sandbox {sandbox_id} not found")
+        environment = await self._load_environment(sandbox_id)
 
         # Stop the sandbox if it's running
         if environment.status == "running":
             await self.stop_sandbox(sandbox_id)
-            
-        # Wait a bit for processes to fully terminate
-        await asyncio.sleep(1)
 
         # Clean up directory
         if environment.project_path and os.path.exists(environment.project_path):
             try:
-                shutil.rmtree(environment.project_path)
-                logger.info(f"Deleted directory {environment.project_path} for sandbox {sandbox_id}")
+                # node_modules trees are deleted by a thread pool, off the event loop
+                await asyncio.to_thread(fast_rmtree, environment.project_path)
+                logger.info("Deleted directory %s for sandbox %s", environment.project_path, sandbox_id)
             except OSError as e:
-                if e.errno == 66:  # Directory not empty
-                    logger.warning(f"Directory {environment.project_path} not empty, attempting force delete")
+                if e.errno == errno.ENOTEMPTY:
+                    logger.warning("Directory %s not empty, attempting force delete", environment.project_path)
                     # Try to force delete by removing files individually
                     try:
-                        for root, dirs, files in os.walk(environment.project_path, topdown=False):
-                            for name in files:
-                                try:
-                                    os.remove(os.path.join(root, name))
-                                except OSError:
-                                    pass  # Ignore individual file deletion errors
-                            for name in dirs:
-                                try:
-                                    os.rmdir(os.path.join(root, name))
-                                except OSError:
-                                    pass  # Ignore individual directory deletion errors
-                        os.rmdir(environment.project_path)
-                        logger.info(f"Force deleted directory {environment.project_path} for sandbox {sandbox_id}")
+                        await asyncio.to_thread(force_rmtree, environment.project_path)
+                        logger.info("Force deleted directory %s for sandbox %s", environment.project_path, sandbox_id)
                     except Exception as force_e:
-                        logger.error(f"Failed to force delete directory {environment.project_path}: {force_e}")
+                        logger.error("Failed to force delete directory %s: %s", environment.project_path, force_e)
                         # Don't raise error, continue with cleanup
                 else:
-                    logger.error(f"Failed to delete directory {environment.project_path}: {e}")
+                    logger.error("Failed to delete directory %s: %s", environment.project_path, e)
                     # Don't raise error for directory deletion failures
 
         # Remove from environments
-        if sandbox_id in self.environments:
-            del self.environments[sandbox_id]
+        self.environments.pop(sandbox_id, None)
+
+        # Drop the sandbox's ChromaDB index as a whole instead of file by file
+        if CHROMA_INTEGRATION_AVAILABLE:
+            self._run_in_background(asyncio.to_thread(
+                chroma_integration.delete_collection, self._index_collection_name(sandbox_id)
+            ))
 
         # Remove from database
-        try:
-            from app.database import Sandbox
-            await Sandbox.find_one(Sandbox.sandboxId == sandbox_id).delete()
-            logger.info(f"Deleted sandbox {sandbox_id} from database")
-        except Exception as e:
-            logger.warning(f"Failed to delete sandbox {sandbox_id} from database: {e}")
+        self._queue_db_write(f"delete sandbox {sandbox_id}", lambda: self._delete_sandbox_document(sandbox_id))
 
-        logger.info(f"Deleted sandbox {sandbox_id}")
+        logger.info("Deleted sandbox %s", sandbox_id)
 
     def get_all_sandboxes(self) -> List[SandboxEnvironment]:
         """Get all sandboxes"""
@@ -987,11 +893,8 @@ document.addEventListener('DOMContentLoaded', function() {
     async def update_project_metadata(self, environment: SandboxEnvironment):
         """Update sandbox metadata with comprehensive project information."""
         try:
-            # Import the metadata generator
-            from app.utils.sandbox_metadata import generate_sandbox_metadata
-            
-            # Generate comprehensive metadata
-            project_metadata = generate_sandbox_metadata(environment.project_path)
+            # Generate comprehensive metadata; the tree walk runs off the event loop
+            project_metadata = await asyncio.to_thread(generate_sandbox_metadata, environment.project_path)
             
             # Update environment metadata with generated information
             environment.metadata.update({
@@ -1017,10 +920,10 @@ document.addEventListener('DOMContentLoaded', function() {
             if "entry_points" in project_metadata:
                 environment.metadata["entry_points"] = project_metadata["entry_points"]
             
-            logger.info(f"Updated metadata for sandbox {environment.id}")
+            logger.info("Updated metadata for sandbox %s", environment.id)
             
         except Exception as e:
-            logger.error(f"Failed to update metadata for sandbox {environment.id}: {e}")
+            logger.error("Failed to update metadata for sandbox %s: %s", environment.id, e)
             # Don't fail sandbox creation if metadata generation fails
             environment.metadata["metadata_error"] = str(e)
 
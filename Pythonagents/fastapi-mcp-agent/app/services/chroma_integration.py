@@ -8,8 +8,13 @@ including creation, modification, and editing. It also handles sandbox file inde
 import os
 import logging
 import hashlib
+import functools
+import threading
 import mimetypes
-from typing import Dict, List, Any, Optional, Set
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Tuple
 from pathlib import Path
 from datetime import datetime
 
@@ -20,6 +25,16 @@ try:
 except ImportError:
     CHROMADB_AVAILABLE = False
 
+# IDs only need to be unique, not cryptographic: prefer the much faster xxh3
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Batched io_uring reads for directory ingest (optional, Linux only)
+from app.utils.uring_io import LIBURING_AVAILABLE, read_files_uring
+
 # Import centralized ChromaDB configuration
 try:
     from app.config.chroma_config import get_chroma_path
@@ -29,9 +44,87 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Embedding model shared by every vector store in the process
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+@functools.lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load the sentence transformer once per process and warm it up in the background."""
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    # The first encode pays for tokenizer and graph setup; do it before a user request does
+    threading.Thread(target=model.encode, args=(["warmup"],), name="embedding-warmup", daemon=True).start()
+    return model
+
+def _fast_id(data: str) -> str:
+    """Short non-cryptographic hex digest used to build document IDs."""
+    raw = data.encode()
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_64_hexdigest(raw)[:8]
+    return hashlib.blake2b(raw, digest_size=4).hexdigest()
+
+def _content_hash(content: str) -> str:
+    """Full-width digest of a file's content, stored to detect unchanged files."""
+    raw = content.encode()
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(raw)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _decode_text(raw: bytes) -> str:
+    """Decode file bytes exactly as open(..., 'r', encoding='utf-8', errors='ignore') would."""
+    content = raw.decode('utf-8', errors='ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+# SQLite file Chroma keeps inside its persist directory
+CHROMA_SQLITE_FILENAME = "chroma.sqlite3"
+
+def enable_sqlite_wal(db_path: Path) -> None:
+    """Put Chroma's SQLite store in WAL mode.
+
+    journal_mode=WAL is stored in the database file itself, so it has to be set
+    once, before Chroma opens its own connections, and then applies to all of
+    them: writes append to the log instead of rewriting the rollback journal,
+    and readers no longer block on an in-progress write.
+    """
+    try:
+        conn = sqlite3.connect(str(db_path))
+        try:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        finally:
+            conn.close()
+        if mode != "wal":
+            logger.warning(f"ChromaDB store at {db_path} stayed in {mode} journal mode")
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to enable WAL for ChromaDB store at {db_path}: {e}")
+
 class ChromaDBIntegrationService:
     """Service for automatic ChromaDB integration with file operations."""
     
+    # Chunks per embedding + upsert call when indexing a directory
+    INDEX_BATCH_SIZE = 200
+    # Sequences per forward pass inside a single encode call
+    ENCODE_BATCH_SIZE = 64
+    # Threads reading and chunking files ahead of the embedding step
+    INDEX_READ_WORKERS = 8
+    # Files read per io_uring submission during directory ingest
+    INDEX_READ_WINDOW = 128
+    # Seconds the background writer waits so a burst of saves lands in one upsert
+    INDEX_COALESCE_DELAY = 0.1
+    
+    # Language recorded in chunk metadata, by file extension
+    EXTENSION_LANGUAGES = {
+        '.py': 'python',
+        '.js': 'javascript', '.jsx': 'javascript',
+        '.ts': 'typescript', '.tsx': 'typescript',
+        '.vue': 'vue',
+        '.html': 'html',
+        '.css': 'css', '.scss': 'css', '.sass': 'css', '.less': 'css',
+        '.md': 'markdown',
+        '.json': 'json',
+        '.yaml': 'yaml', '.yml': 'yaml',
+    }
+    
     def __init__(self, persist_directory: str = None):
         if not CHROMADB_AVAILABLE:
             logger.warning("ChromaDB not available - file indexing disabled")
@@ -52,30 +145,39 @@ class ChromaDBIntegrationService:
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(exist_ok=True)
         
+        # Switch the store to WAL before Chroma opens it
+        enable_sqlite_wal(self.persist_directory / CHROMA_SQLITE_FILENAME)
+        
         # Initialize ChromaDB client with persistence
         self.client = chromadb.PersistentClient(path=str(self.persist_directory))
         
         # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = get_embedding_model()
         
         # Cache for collections
         self.collections = {}
         
+        # Files queued by schedule_index_file, coalesced per (collection, path);
+        # a single writer thread embeds and upserts them off the request path
+        self._pending_index: Dict[Tuple[str, str], Optional[str]] = {}
+        self._pending_lock = threading.Lock()
+        self._index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-index")
+        
         # File extensions to index
-        self.indexable_extensions = {
+        self.indexable_extensions = frozenset({
             '.py', '.js', '.jsx', '.ts', '.tsx', '.vue', '.java', '.cpp', '.c', '.h',
             '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.r',
             '.m', '.mm', '.sh', '.sql', '.html', '.css', '.scss', '.sass', '.less',
             '.json', '.yaml', '.yml', '.xml', '.md', '.txt', '.env', '.config',
             '.dockerfile', '.gitignore', '.gitattributes'
-        }
+        })
         
         # Directories to exclude from indexing
-        self.excluded_dirs = {
+        self.excluded_dirs = frozenset({
             'node_modules', '.git', '.vscode', '.idea', '__pycache__', '.pytest_cache',
             'venv', 'env', '.env', 'dist', 'build', '.next', '.nuxt', 'target',
             'bin', 'obj', '.gradle', '.mvn', 'coverage', '.nyc_output'
-        }
+        })
         
         logger.info("ChromaDB Integration Service initialized")
     
@@ -85,6 +187,9 @@ class ChromaDBIntegrationService:
             return None
             
         if name not in self.collections:
+            # No embedding_function is registered: existing stores persisted the
+            # default one and Chroma rejects a different function on reopen.
+            # Embeddings come from the shared model as float32 arrays instead.
             self.collections[name] = self.client.get_or_create_collection(name=name)
         return self.collections[name]
     
@@ -100,15 +205,16 @@ class ChromaDBIntegrationService:
             return False
             
         # Check if any parent directory is excluded
-        for part in path.parts:
-            if part in self.excluded_dirs:
-                return False
+        if not self.excluded_dirs.isdisjoint(path.parts):
+            return False
                 
-        # Check file size (skip files larger than 1MB)
+        # Check file size (skip files larger than 1MB) with a single stat
         try:
-            if path.exists() and path.stat().st_size > 1024 * 1024:
+            if os.stat(file_path).st_size > 1024 * 1024:
                 return False
-        except (OSError, PermissionError):
+        except FileNotFoundError:
+            pass  # Missing files are not size-checked
+        except OSError:
             return False
             
         return True
@@ -116,9 +222,9 @@ class ChromaDBIntegrationService:
     def generate_file_id(self, file_path: str, content: str = None) -> str:
         """Generate a unique ID for a file."""
         # Use file path and content hash for unique ID
-        path_hash = hashlib.md5(file_path.encode()).hexdigest()[:8]
+        path_hash = _fast_id(file_path)
         if content:
-            content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
+            content_hash = _fast_id(content)
             return f"file_{path_hash}_{content_hash}"
         return f"file_{path_hash}"
     
@@ -126,118 +232,198 @@ class ChromaDBIntegrationService:
         """Split content into overlapping chunks."""
         if len(content) <= chunk_size:
             return [content]
-            
-        chunks = []
-        start = 0
-        while start < len(content):
-            end = start + chunk_size
-            chunk = content[start:end]
-            chunks.append(chunk)
-            start = end - overlap
-            
-        return chunks
+        
+        # A non-positive step would never advance past the first chunk
+        step = chunk_size - overlap
+        if step <= 0:
+            raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+        
+        return [content[start:start + chunk_size] for start in range(0, len(content), step)]
     
-    def extract_metadata(self, file_path: str, content: str) -> Dict[str, Any]:
-        """Extract metadata from file."""
+    def extract_metadata(self, file_path: str, content: str, indexed_at: Optional[str] = None) -> Dict[str, Any]:
+        """Extract metadata from file; indexed_at lets a batch share one timestamp."""
         path = Path(file_path)
+        extension = path.suffix.lower()
         
         metadata = {
             'file_path': str(path),
             'filename': path.name,
-            'extension': path.suffix.lower(),
+            'extension': extension,
             'directory': str(path.parent),
             'size': len(content),
-            'indexed_at': datetime.now().isoformat(),
+            'indexed_at': indexed_at or datetime.now().isoformat(),
             'content_type': mimetypes.guess_type(str(path))[0] or 'text/plain'
         }
         
         # Add language-specific metadata
-        if path.suffix.lower() in ['.py']:
-            metadata['language'] = 'python'
-        elif path.suffix.lower() in ['.js', '.jsx']:
-            metadata['language'] = 'javascript'
-        elif path.suffix.lower() in ['.ts', '.tsx']:
-            metadata['language'] = 'typescript'
-        elif path.suffix.lower() in ['.vue']:
-            metadata['language'] = 'vue'
-        elif path.suffix.lower() in ['.html']:
-            metadata['language'] = 'html'
-        elif path.suffix.lower() in ['.css', '.scss', '.sass', '.less']:
-            metadata['language'] = 'css'
-        elif path.suffix.lower() in ['.md']:
-            metadata['language'] = 'markdown'
-        elif path.suffix.lower() in ['.json']:
-            metadata['language'] = 'json'
-        elif path.suffix.lower() in ['.yaml', '.yml']:
-            metadata['language'] = 'yaml'
+        language = self.EXTENSION_LANGUAGES.get(extension)
+        if language:
+            metadata['language'] = language
         
         return metadata
     
+    def prepare_file_chunks(self, file_path: str, content: str = None,
+                            indexed_at: Optional[str] = None) -> Optional[Tuple[List[str], List[str], List[Dict[str, Any]]]]:
+        """Read and chunk a file into (ids, documents, metadatas), or None if there is nothing to index."""
+        # Read content if not provided
+        if content is None:
+            try:
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except Exception as e:
+                logger.warning(f"Failed to read file {file_path}: {e}")
+                return None
+        
+        # Skip empty files
+        if not content.strip():
+            return None
+        
+        # Extract metadata
+        metadata = self.extract_metadata(file_path, content, indexed_at)
+        metadata['content_hash'] = _content_hash(content)
+        
+        # Chunk content for large files
+        chunks = self.chunk_content(content)
+        
+        # Prepare documents for indexing
+        documents = []
+        metadatas = []
+        ids = []
+        
+        for i, chunk in enumerate(chunks):
+            doc_id = f"{self.generate_file_id(file_path, chunk)}_{i}"
+            chunk_metadata = metadata.copy()
+            chunk_metadata.update({
+                'chunk_index': i,
+                'total_chunks': len(chunks),
+                'chunk_size': len(chunk)
+            })
+            
+            documents.append(chunk)
+            metadatas.append(chunk_metadata)
+            ids.append(doc_id)
+        
+        return ids, documents, metadatas
+    
+    def encode_documents(self, documents: List[str]):
+        """Embed a list of documents with one encode call.
+
+        The float32 array goes to Chroma as is: round-tripping it through
+        Python float lists only for Chroma to convert it back is pure overhead.
+        """
+        return self.embedding_model.encode(
+            documents,
+            batch_size=self.ENCODE_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+    
+    def upsert_chunks(self, collection, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed documents in one pass and upsert them into a collection."""
+        # Generate embeddings
+        embeddings = self.encode_documents(documents)
+        
+        # Add to collection (upsert to handle updates)
+        collection.upsert(
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+    
+    def indexed_content_hashes(self, collection, file_paths: List[str]) -> Dict[str, Set[str]]:
+        """Content hashes already stored in a collection for each of the given files."""
+        if not file_paths:
+            return {}
+        # Every indexed version of a file has exactly one first chunk
+        existing = collection.get(
+            where={"$and": [{"file_path": {"$in": file_paths}}, {"chunk_index": 0}]},
+            include=["metadatas"]
+        )
+        hashes: Dict[str, Set[str]] = {}
+        for metadata in existing["metadatas"] or []:
+            if metadata.get("content_hash"):
+                hashes.setdefault(metadata["file_path"], set()).add(metadata["content_hash"])
+        return hashes
+    
     def index_file(self, file_path: str, content: str = None, collection_name: str = "files") -> bool:
         """Index a single file in ChromaDB."""
         if not self.enabled or not self.should_index_file(file_path):
             return False
             
         try:
-            # Read content if not provided
-            if content is None:
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                except Exception as e:
-                    logger.warning(f"Failed to read file {file_path}: {e}")
-                    return False
-            
-            # Skip empty files
-            if not content.strip():
+            prepared = self.prepare_file_chunks(file_path, content)
+            if not prepared:
                 return False
                 
             collection = self.get_or_create_collection(collection_name)
             if not collection:
                 return False
             
-            # Extract metadata
-            metadata = self.extract_metadata(file_path, content)
-            
-            # Chunk content for large files
-            chunks = self.chunk_content(content)
-            
-            # Prepare documents for indexing
-            documents = []
-            metadatas = []
-            ids = []
+            ids, documents, metadatas = prepared
+            indexed_path, content_hash = metadatas[0]["file_path"], metadatas[0]["content_hash"]
+            if content_hash in self.indexed_content_hashes(collection, [indexed_path]).get(indexed_path, ()):
+                logger.debug(f"File {file_path} unchanged since last index, skipping")
+                return True
             
-            for i, chunk in enumerate(chunks):
-                doc_id = f"{self.generate_file_id(file_path, chunk)}_{i}"
-                chunk_metadata = metadata.copy()
-                chunk_metadata.update({
-                    'chunk_index': i,
-                    'total_chunks': len(chunks),
-                    'chunk_size': len(chunk)
-                })
-                
-                documents.append(chunk)
-                metadatas.append(chunk_metadata)
-                ids.append(doc_id)
-            
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(documents).tolist()
-            
-            # Add to collection (upsert to handle updates)
-            collection.upsert(
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            self.upsert_chunks(collection, ids, documents, metadatas)
             
-            logger.info(f"Indexed file {file_path} with {len(chunks)} chunks")
+            logger.info(f"Indexed file {file_path} with {len(ids)} chunks")
             return True
             
         except Exception as e:
             logger.error(f"Failed to index file {file_path}: {e}")
             return False
     
+    def schedule_index_file(self, file_path: str, content: str = None, collection_name: str = "files") -> bool:
+        """Queue a file for indexing on the background writer and return immediately."""
+        if not self.enabled or not self.should_index_file(file_path):
+            return False
+            
+        with self._pending_lock:
+            start_drain = not self._pending_index
+            # A later save of the same file replaces the queued one
+            self._pending_index[(collection_name, file_path)] = content
+        if start_drain:
+            self._index_executor.submit(self._drain_pending_index)
+        return True
+    
+    def _drain_pending_index(self):
+        """Index everything queued by schedule_index_file with one upsert batch per collection."""
+        time.sleep(self.INDEX_COALESCE_DELAY)
+        with self._pending_lock:
+            pending, self._pending_index = self._pending_index, {}
+        
+        by_collection: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        for (collection_name, file_path), content in pending.items():
+            by_collection.setdefault(collection_name, []).append((file_path, content))
+        
+        for collection_name, files in by_collection.items():
+            try:
+                collection = self.get_or_create_collection(collection_name)
+                indexed_at = datetime.now().isoformat()
+                batch = {"ids": [], "documents": [], "metadatas": [], "files": []}
+                indexed_files: List[str] = []
+                errors: List[str] = []
+                known_hashes = self.indexed_content_hashes(collection, [str(Path(path)) for path, _ in files])
+                for file_path, content in files:
+                    prepared = self.prepare_file_chunks(file_path, content, indexed_at)
+                    if not prepared:
+                        continue
+                    ids, documents, metadatas = prepared
+                    if metadatas[0]["content_hash"] in known_hashes.get(metadatas[0]["file_path"], ()):
+                        continue
+                    batch["ids"].extend(ids)
+                    batch["documents"].extend(documents)
+                    batch["metadatas"].extend(metadatas)
+                    batch["files"].append(file_path)
+                    if len(batch["ids"]) >= self.INDEX_BATCH_SIZE:
+                        self._flush_index_batch(collection, batch, indexed_files, errors)
+                if batch["ids"]:
+                    self._flush_index_batch(collection, batch, indexed_files, errors)
+            except Exception as e:
+                logger.error(f"Failed to index {len(files)} queued files in {collection_name}: {e}")
+    
     def remove_file_from_index(self, file_path: str, collection_name: str = "files") -> bool:
         """Remove a file from the ChromaDB index."""
         if not self.enabled:
@@ -248,9 +434,10 @@ class ChromaDBIntegrationService:
             if not collection:
                 return False
             
-            # Find all documents for this file
+            # Find all documents for this file; only their ids are needed
             results = collection.get(
-                where={"file_path": file_path}
+                where={"file_path": file_path},
+                include=[]
             )
             
             if results['ids']:
@@ -263,14 +450,76 @@ class ChromaDBIntegrationService:
             
         return False
     
+    def delete_collection(self, collection_name: str) -> bool:
+        """Drop a whole collection, e.g. the index of a deleted sandbox."""
+        if not self.enabled:
+            return False
+            
+        self.collections.pop(collection_name, None)
+        try:
+            self.client.delete_collection(name=collection_name)
+            logger.info(f"Deleted collection {collection_name}")
+            return True
+        except Exception as e:
+            # Raised as well when the collection was never created
+            logger.debug(f"Could not delete collection {collection_name}: {e}")
+            return False
+    
+    def iter_directory_files(self, directory_path: str, recursive: bool = True,
+                             ignore_dirs: Optional[Set[str]] = None):
+        """Yield file paths under a directory, never descending into ignored directories."""
+        ignore = self.excluded_dirs | ignore_dirs if ignore_dirs else self.excluded_dirs
+        stack = [directory_path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and entry.name not in ignore:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry.path
+            except OSError as e:
+                logger.warning(f"Failed to scan directory: {e}")
+
+    def _prepare_directory_files(self, files: List[str], pool: ThreadPoolExecutor, indexed_at: str):
+        """Yield prepare_file_chunks results for files in order, reading them through io_uring when possible."""
+        prepare = functools.partial(self.prepare_file_chunks, indexed_at=indexed_at)
+        if not LIBURING_AVAILABLE:
+            yield from pool.map(prepare, files)
+            return
+        for start in range(0, len(files), self.INDEX_READ_WINDOW):
+            window = files[start:start + self.INDEX_READ_WINDOW]
+            try:
+                raw = read_files_uring(window)
+            except OSError as e:
+                logger.debug(f"io_uring reads unavailable, using plain reads: {e}")
+                raw = [None] * len(window)
+            # Files the ring could not read are read again by prepare_file_chunks
+            contents = [None if data is None else _decode_text(data) for data in raw]
+            yield from pool.map(prepare, window, contents)
+
+    def _flush_index_batch(self, collection, batch: Dict[str, list], indexed_files: List[str], errors: List[str]):
+        """Upsert a pending directory-indexing batch and record which files it covered."""
+        try:
+            self.upsert_chunks(collection, batch["ids"], batch["documents"], batch["metadatas"])
+            indexed_files.extend(batch["files"])
+            logger.info(f"Indexed batch of {len(batch['ids'])} chunks from {len(batch['files'])} files")
+        except Exception as e:
+            logger.error(f"Failed to index batch of {len(batch['files'])} files: {e}")
+            errors.extend(f"Failed to index: {file_str}" for file_str in batch["files"])
+        for values in batch.values():
+            values.clear()
+    
     def index_directory(self, directory_path: str, collection_name: str = "files", 
-                       recursive: bool = True) -> Dict[str, Any]:
-        """Index all files in a directory."""
+                       recursive: bool = True, ignore_dirs: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Index all files in a directory, skipping excluded and ignored subtrees."""
         if not self.enabled:
             return {"success": False, "error": "ChromaDB not available"}
             
         indexed_files = []
         skipped_files = []
+        unchanged_files = []
         errors = []
         
         try:
@@ -278,28 +527,51 @@ class ChromaDBIntegrationService:
             if not path.exists():
                 return {"success": False, "error": f"Directory not found: {directory_path}"}
             
-            # Get all files
-            if recursive:
-                files = path.rglob('*')
-            else:
-                files = path.iterdir()
+            collection = self.get_or_create_collection(collection_name)
             
-            for file_path in files:
-                if file_path.is_file():
-                    file_str = str(file_path)
-                    
-                    if self.should_index_file(file_str):
-                        if self.index_file(file_str, collection_name=collection_name):
-                            indexed_files.append(file_str)
-                        else:
-                            errors.append(f"Failed to index: {file_str}")
-                    else:
-                        skipped_files.append(file_str)
+            # Chunks from many files are embedded and upserted together; one
+            # call per file spends most of its time in per-call overhead
+            batch = {"ids": [], "documents": [], "metadatas": [], "files": []}
+            
+            # Get all files; excluded directories are pruned before they are opened
+            files = []
+            for file_str in self.iter_directory_files(directory_path, recursive, ignore_dirs):
+                if self.should_index_file(file_str):
+                    files.append(file_str)
+                else:
+                    skipped_files.append(file_str)
+            
+            # Every file in one directory pass is stamped with the same time
+            indexed_at = datetime.now().isoformat()
+            
+            # Files whose content is already indexed are not embedded again
+            known_hashes = self.indexed_content_hashes(collection, [str(Path(file_str)) for file_str in files])
+            
+            # Reads are batched and chunking overlaps on a thread pool; results arrive in scan order
+            with ThreadPoolExecutor(max_workers=self.INDEX_READ_WORKERS) as pool:
+                for file_str, prepared in zip(files, self._prepare_directory_files(files, pool, indexed_at)):
+                    if not prepared:
+                        errors.append(f"Failed to index: {file_str}")
+                        continue
+                    ids, documents, metadatas = prepared
+                    if metadatas[0]["content_hash"] in known_hashes.get(metadatas[0]["file_path"], ()):
+                        unchanged_files.append(file_str)
+                        continue
+                    batch["ids"].extend(ids)
+                    batch["documents"].extend(documents)
+                    batch["metadatas"].extend(metadatas)
+                    batch["files"].append(file_str)
+                    if len(batch["ids"]) >= self.INDEX_BATCH_SIZE:
+                        self._flush_index_batch(collection, batch, indexed_files, errors)
+            
+            if batch["ids"]:
+                self._flush_index_batch(collection, batch, indexed_files, errors)
             
             result = {
                 "success": True,
                 "indexed_files": len(indexed_files),
                 "skipped_files": len(skipped_files),
+                "unchanged_files": len(unchanged_files),
                 "errors": len(errors),
                 "details": {
                     "indexed": indexed_files[:10],  # Show first 10
@@ -327,7 +599,7 @@ class ChromaDBIntegrationService:
                 return []
             
             # Generate query embedding
-            query_embedding = self.embedding_model.encode([query]).tolist()[0]
+            query_embedding = self.encode_documents([query])[0]
             
             # Search
             results = collection.query(
@@ -402,7 +674,7 @@ class ChromaDBIntegrationService:
                 return False
             
             # Generate unique ID for this message
-            message_id = f"{session_id}_{message_index}_{role}_{hashlib.md5(message.encode()).hexdigest()[:8]}"
+            message_id = f"{session_id}_{message_index}_{role}_{_fast_id(message)}"
             
             # Prepare metadata
             metadata = {
@@ -418,23 +690,20 @@ class ChromaDBIntegrationService:
             # Chunk the message if it's too long
             chunks = self.chunk_content(message, chunk_size=500, overlap=50)
             
-            # Index each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{message_id}_chunk_{i}"
+            # Embed every chunk together and add them in one call
+            chunk_metadatas = []
+            for i in range(len(chunks)):
                 chunk_metadata = metadata.copy()
                 chunk_metadata["chunk_index"] = i
                 chunk_metadata["total_chunks"] = len(chunks)
-                
-                # Generate embedding
-                embedding = self.embedding_model.encode(chunk).tolist()
-                
-                # Add to collection
-                collection.add(
-                    ids=[chunk_id],
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[chunk_metadata]
-                )
+                chunk_metadatas.append(chunk_metadata)
+            
+            collection.add(
+                ids=[f"{message_id}_chunk_{i}" for i in range(len(chunks))],
+                embeddings=self.encode_documents(chunks),
+                documents=chunks,
+                metadatas=chunk_metadatas
+            )
             
             logger.info(f"Successfully indexed chat message: {message_id} ({len(chunks)} chunks)")
             return True
@@ -469,7 +738,7 @@ class ChromaDBIntegrationService:
                 return []
             
             # Generate query embedding
-            query_embedding = self.embedding_model.encode(query).tolist()
+            query_embedding = self.encode_documents([query])[0]
             
             # Prepare where clause for filtering
             where_clause = {"type": "chat_message"}
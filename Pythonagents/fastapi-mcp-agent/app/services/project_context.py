@@ -1,36 +1,185 @@
 import os
 import json
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 from pathlib import Path
 import re
+import fnmatch
+from collections import Counter, OrderedDict
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Aho-Corasick automata for dependency matching (optional)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Directories never descended into when walking a project
+IGNORED_DIRS = frozenset({'.git', 'node_modules', '__pycache__', 'venv'})
+
+# gather_full_context results by (project root, max_depth, include_file_contents),
+# each stored with the fingerprint of the tree it was computed from
+CONTEXT_CACHE_SIZE = 32
+_context_cache: "OrderedDict[Tuple[str, int, bool], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+
+# Files whose presence suggests each application type, in tie-break order
+APP_INDICATORS = (
+    ("react", ("package.json", "src/App.js", "src/App.tsx", "public/index.html")),
+    ("nextjs", ("next.config.js", "next.config.mjs", "pages/", "app/")),
+    ("vue", ("vue.config.js", "src/main.js", "src/App.vue")),
+    ("angular", ("angular.json", "src/app/app.module.ts")),
+    ("fastapi", ("main.py", "app/main.py", "requirements.txt")),
+    ("django", ("manage.py", "settings.py", "wsgi.py")),
+    ("flask", ("app.py", "requirements.txt")),
+    ("express", ("package.json", "server.js", "app.js")),
+    ("spring", ("pom.xml", "build.gradle", "src/main/java")),
+    ("laravel", ("composer.json", "artisan", "app/Http")),
+    ("rails", ("Gemfile", "config/application.rb", "app/controllers"))
+)
+
+# Top-level configuration files, as one alternation of the translated globs
+CONFIG_FILE_PATTERNS = (
+    "*.config.js", "*.config.mjs", "*.config.ts",
+    "tsconfig.json", "jsconfig.json",
+    ".env*", "*.yml", "*.yaml",
+    "Dockerfile", "docker-compose.yml",
+    ".gitignore", "README.md"
+)
+CONFIG_FILE_RE = re.compile("|".join(fnmatch.translate(pattern) for pattern in CONFIG_FILE_PATTERNS))
+
+# Files only one framework creates; the first present decides the type without scoring
+APP_MARKERS = (
+    ("next.config.js", "nextjs"),
+    ("next.config.mjs", "nextjs"),
+    ("angular.json", "angular"),
+    ("manage.py", "django"),
+    ("artisan", "laravel"),
+    ("config/application.rb", "rails"),
+    ("pom.xml", "spring")
+)
+
+# Substrings of package.json dependency names and the technology they indicate
+TECH_MAPPING = {
+    "react": "React",
+    "vue": "Vue.js",
+    "angular": "Angular",
+    "next": "Next.js",
+    "express": "Express.js",
+    "fastify": "Fastify",
+    "typescript": "TypeScript",
+    "tailwindcss": "Tailwind CSS",
+    "sass": "Sass",
+    "webpack": "Webpack",
+    "vite": "Vite"
+}
+
+# Substrings of requirements.txt package names and the technology they indicate
+PYTHON_MAPPING = {
+    "fastapi": "FastAPI",
+    "django": "Django",
+    "flask": "Flask",
+    "sqlalchemy": "SQLAlchemy",
+    "pydantic": "Pydantic",
+    "uvicorn": "Uvicorn",
+    "gunicorn": "Gunicorn"
+}
+
+
+def _build_automaton(mapping: Dict[str, str]):
+    automaton = ahocorasick.Automaton()
+    for key, tech in mapping.items():
+        automaton.add_word(key, tech)
+    automaton.make_automaton()
+    return automaton
+
+
+if AHOCORASICK_AVAILABLE:
+    # One linear scan per name finds every key it contains
+    TECH_AUTOMATON = _build_automaton(TECH_MAPPING)
+    PYTHON_AUTOMATON = _build_automaton(PYTHON_MAPPING)
+else:
+    TECH_AUTOMATON = PYTHON_AUTOMATON = None
+
+
+def _match_technologies(name: str, mapping: Dict[str, str], automaton) -> List[str]:
+    """Technologies whose mapping key occurs in the lowercased name."""
+    if automaton is not None:
+        return [tech for _, tech in automaton.iter(name)]
+    return [tech for key, tech in mapping.items() if key in name]
+
 class ProjectContextService:
     """Service for gathering comprehensive project context information."""
     
     def __init__(self, project_path: str):
         self.project_path = Path(project_path)
+        # Plain string root for the scandir helpers, which never build Path objects
+        self._root = os.fspath(self.project_path)
         self.context = {}
+        # scandir results per project-relative directory ("" is the root), shared
+        # by every helper so no directory is listed or stat'ed twice
+        self._children: Dict[str, Dict[str, os.DirEntry]] = {}
+        self._unreadable: set = set()
     
-    async def gather_full_context(self, max_depth: int = 3, include_file_contents: bool = True) -> Dict[str, Any]:
-        """Gather comprehensive project context including structure, type, and metadata."""
+    async def gather_full_context(self, max_depth: int = 3, include_file_contents: bool = True,
+                                  refresh: bool = False) -> Dict[str, Any]:
+        """Gather comprehensive project context including structure, type, and metadata.
+
+        Results are cached per project and reused while its file tree is unchanged;
+        pass refresh=True to recompute regardless. The returned dict may be shared
+        with the cache and must not be modified.
+        """
         try:
+            key = (os.path.abspath(self._root), max_depth, include_file_contents)
+            # The fingerprint walk fills the scandir cache the gather below reuses
+            fingerprint = await asyncio.to_thread(self._tree_fingerprint)
+            cached = _context_cache.get(key)
+            if not refresh and cached is not None and cached[0] == fingerprint:
+                _context_cache.move_to_end(key)
+                return cached[1]
+            
+            # The helpers are blocking disk work; run them side by side in worker threads
+            jobs = [
+                asyncio.to_thread(self._get_directory_structure_sync, max_depth),
+                asyncio.to_thread(self._detect_app_type_sync),
+                asyncio.to_thread(self._detect_technologies_sync),
+                asyncio.to_thread(self._get_package_info_sync),
+                asyncio.to_thread(self._get_config_files_sync),
+                asyncio.to_thread(self._find_entry_points_sync),
+                asyncio.to_thread(self._get_file_statistics_sync),
+                asyncio.to_thread(self._detect_patterns_sync)
+            ]
+            if include_file_contents:
+                jobs.append(asyncio.to_thread(self._get_key_file_contents_sync))
+            results = await asyncio.gather(*jobs)
+            
             context = {
                 "project_path": str(self.project_path),
-                "structure": await self._get_directory_structure(max_depth),
-                "app_type": await self._detect_app_type(),
-                "technologies": await self._detect_technologies(),
-                "package_info": await self._get_package_info(),
-                "config_files": await self._get_config_files(),
-                "entry_points": await self._find_entry_points(),
-                "file_stats": await self._get_file_statistics(),
-                "patterns": await self._detect_patterns()
+                "structure": results[0],
+                "app_type": results[1],
+                "technologies": results[2],
+                "package_info": results[3],
+                "config_files": results[4],
+                "entry_points": results[5],
+                "file_stats": results[6],
+                "patterns": results[7]
             }
             
             if include_file_contents:
-                context["key_files"] = await self._get_key_file_contents()
+                context["key_files"] = results[8]
+            
+            _context_cache[key] = (fingerprint, context)
+            _context_cache.move_to_end(key)
+            if len(_context_cache) > CONTEXT_CACHE_SIZE:
+                _context_cache.popitem(last=False)
             
             return context
             
@@ -39,116 +188,88 @@ class ProjectContextService:
             return {"error": str(e), "project_path": str(self.project_path)}
     
     async def _get_directory_structure(self, max_depth: int = 3) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._get_directory_structure_sync, max_depth)
+    
+    async def _detect_app_type(self) -> str:
+        return await asyncio.to_thread(self._detect_app_type_sync)
+    
+    async def _detect_technologies(self) -> List[str]:
+        return await asyncio.to_thread(self._detect_technologies_sync)
+    
+    async def _get_package_info(self) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get_package_info_sync)
+    
+    async def _get_file_statistics(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._get_file_statistics_sync)
+    
+    def _get_directory_structure_sync(self, max_depth: int = 3) -> Dict[str, Any]:
         """Get the directory structure as a nested dictionary."""
-        def build_tree(path: Path, current_depth: int = 0) -> Dict[str, Any]:
-            if current_depth >= max_depth or not path.exists():
+        def build_tree(rel: str, current_depth: int = 0) -> Dict[str, Any]:
+            if current_depth >= max_depth:
                 return {}
             
-            tree = {"type": "directory", "children": {}}
-            
-            try:
-                for item in sorted(path.iterdir()):
-                    # Skip hidden files and common ignore patterns
-                    if item.name.startswith('.') or item.name in ['node_modules', '__pycache__', 'venv', '.git']:
-                        continue
-                    
-                    if item.is_dir():
-                        tree["children"][item.name] = build_tree(item, current_depth + 1)
-                    else:
-                        tree["children"][item.name] = {
-                            "type": "file",
-                            "size": item.stat().st_size if item.exists() else 0,
-                            "extension": item.suffix
-                        }
-            except PermissionError:
+            children = {}
+            tree = {"type": "directory", "children": children}
+            entries = self._list_dir(rel)
+            if rel in self._unreadable:
                 tree["error"] = "Permission denied"
+                return tree
+            
+            for name in sorted(entries):
+                # Skip hidden files and common ignore patterns
+                if name.startswith('.') or name in IGNORED_DIRS:
+                    continue
+                
+                entry = entries[name]
+                if entry.is_dir():
+                    children[name] = build_tree(f"{rel}/{name}" if rel else name, current_depth + 1)
+                else:
+                    children[name] = {
+                        "type": "file",
+                        "size": self._entry_size(entry),
+                        "extension": os.path.splitext(name)[1]
+                    }
             
             return tree
         
-        return build_tree(self.project_path)
+        if not os.path.exists(self._root):
+            return {}
+        return build_tree("")
     
-    async def _detect_app_type(self) -> str:
+    def _detect_app_type_sync(self) -> str:
         """Detect the type of application based on files and structure."""
-        # Check for common framework indicators
-        indicators = {
-            "react": ["package.json", "src/App.js", "src/App.tsx", "public/index.html"],
-            "nextjs": ["next.config.js", "next.config.mjs", "pages/", "app/"],
-            "vue": ["vue.config.js", "src/main.js", "src/App.vue"],
-            "angular": ["angular.json", "src/app/app.module.ts"],
-            "fastapi": ["main.py", "app/main.py", "requirements.txt"],
-            "django": ["manage.py", "settings.py", "wsgi.py"],
-            "flask": ["app.py", "requirements.txt"],
-            "express": ["package.json", "server.js", "app.js"],
-            "spring": ["pom.xml", "build.gradle", "src/main/java"],
-            "laravel": ["composer.json", "artisan", "app/Http"],
-            "rails": ["Gemfile", "config/application.rb", "app/controllers"]
-        }
-        
-        detected_types = []
+        for marker, app_type in APP_MARKERS:
+            if self._file_exists(marker):
+                return app_type
         
-        for app_type, files in indicators.items():
-            score = 0
-            for file_pattern in files:
-                if self._file_exists(file_pattern):
-                    score += 1
-            
-            if score > 0:
-                detected_types.append((app_type, score))
+        # Highest-scoring type wins; ties go to the earlier entry in APP_INDICATORS
+        best_type, best_score = "unknown", 0
+        for app_type, files in APP_INDICATORS:
+            score = sum(1 for file_pattern in files if self._file_exists(file_pattern))
+            if score > best_score:
+                best_type, best_score = app_type, score
         
-        if detected_types:
-            # Return the type with highest score
-            detected_types.sort(key=lambda x: x[1], reverse=True)
-            return detected_types[0][0]
-        
-        return "unknown"
+        return best_type
     
-    async def _detect_technologies(self) -> List[str]:
+    def _detect_technologies_sync(self) -> List[str]:
         """Detect technologies used in the project."""
         technologies = set()
         
         # Check package.json for JavaScript/Node.js technologies
-        package_json = await self._read_json_file("package.json")
+        package_json = self._read_json_file("package.json")
         if package_json:
             dependencies = {**package_json.get("dependencies", {}), **package_json.get("devDependencies", {})}
             
             # Map dependencies to technologies
-            tech_mapping = {
-                "react": "React",
-                "vue": "Vue.js",
-                "angular": "Angular",
-                "next": "Next.js",
-                "express": "Express.js",
-                "fastify": "Fastify",
-                "typescript": "TypeScript",
-                "tailwindcss": "Tailwind CSS",
-                "sass": "Sass",
-                "webpack": "Webpack",
-                "vite": "Vite"
-            }
-            
             for dep in dependencies:
-                for key, tech in tech_mapping.items():
-                    if key in dep.lower():
-                        technologies.add(tech)
+                technologies.update(_match_technologies(dep.lower(), TECH_MAPPING, TECH_AUTOMATON))
         
         # Check requirements.txt for Python technologies
-        requirements = await self._read_file("requirements.txt")
+        requirements = self._read_file("requirements.txt")
         if requirements:
-            python_mapping = {
-                "fastapi": "FastAPI",
-                "django": "Django",
-                "flask": "Flask",
-                "sqlalchemy": "SQLAlchemy",
-                "pydantic": "Pydantic",
-                "uvicorn": "Uvicorn",
-                "gunicorn": "Gunicorn"
-            }
-            
             for line in requirements.split('\n'):
                 package = line.split('==')[0].split('>=')[0].strip().lower()
-                for key, tech in python_mapping.items():
-                    if key in package:
-                        technologies.add(tech)
+                technologies.update(_match_technologies(package, PYTHON_MAPPING, PYTHON_AUTOMATON))
         
         # Check for other technology indicators
         if self._file_exists("Dockerfile"):
@@ -160,10 +281,10 @@ class ProjectContextService:
         
         return list(technologies)
     
-    async def _get_package_info(self) -> Optional[Dict[str, Any]]:
+    def _get_package_info_sync(self) -> Optional[Dict[str, Any]]:
         """Get package information from package.json or similar files."""
         # Try package.json first
-        package_json = await self._read_json_file("package.json")
+        package_json = self._read_json_file("package.json")
         if package_json:
             return {
                 "type": "npm",
@@ -176,43 +297,36 @@ class ProjectContextService:
             }
         
         # Try pyproject.toml for Python projects
-        pyproject = await self._read_file("pyproject.toml")
+        pyproject = self._read_file("pyproject.toml")
         if pyproject:
             return {"type": "python", "config": "pyproject.toml"}
         
         # Try requirements.txt
-        requirements = await self._read_file("requirements.txt")
+        requirements = self._read_file("requirements.txt")
         if requirements:
             deps = [line.strip() for line in requirements.split('\n') if line.strip() and not line.startswith('#')]
             return {"type": "python", "dependencies": deps}
         
         return None
     
-    async def _get_config_files(self) -> List[Dict[str, Any]]:
+    def _get_config_files_sync(self) -> List[Dict[str, Any]]:
         """Get information about configuration files."""
-        config_patterns = [
-            "*.config.js", "*.config.mjs", "*.config.ts",
-            "tsconfig.json", "jsconfig.json",
-            ".env*", "*.yml", "*.yaml",
-            "Dockerfile", "docker-compose.yml",
-            ".gitignore", "README.md"
-        ]
-        
         config_files = []
+        root_entries = self._list_dir("")
         
-        for pattern in config_patterns:
-            files = list(self.project_path.glob(pattern))
-            for file in files:
-                if file.is_file():
-                    config_files.append({
-                        "name": file.name,
-                        "path": str(file.relative_to(self.project_path)),
-                        "size": file.stat().st_size
-                    })
+        # One pass over the root listing; a name matching several patterns is listed once
+        for name in sorted(root_entries):
+            entry = root_entries[name]
+            if CONFIG_FILE_RE.match(name) and entry.is_file():
+                config_files.append({
+                    "name": name,
+                    "path": name,
+                    "size": self._entry_size(entry)
+                })
         
         return config_files
     
-    async def _find_entry_points(self) -> List[str]:
+    def _find_entry_points_sync(self) -> List[str]:
         """Find likely entry points for the application."""
         entry_points = []
         
@@ -229,36 +343,39 @@ class ProjectContextService:
         
         return entry_points
     
-    async def _get_file_statistics(self) -> Dict[str, Any]:
+    def _get_file_statistics_sync(self) -> Dict[str, Any]:
         """Get statistics about files in the project."""
-        stats = {
-            "total_files": 0,
-            "total_directories": 0,
-            "file_types": {},
-            "total_size": 0
-        }
+        # Accumulate in locals; extensions are collected in a list and counted in
+        # one C-level Counter pass at the end, and the result dict is built once
+        total_files = total_directories = total_size = 0
+        extensions = []
+        add_extension = extensions.append
+        splitext = os.path.splitext
+        entry_size = self._entry_size
         
         try:
-            for item in self.project_path.rglob("*"):
-                if any(ignore in str(item) for ignore in ['.git', 'node_modules', '__pycache__', 'venv']):
-                    continue
-                
-                if item.is_file():
-                    stats["total_files"] += 1
-                    stats["total_size"] += item.stat().st_size
-                    
-                    ext = item.suffix.lower()
-                    if ext:
-                        stats["file_types"][ext] = stats["file_types"].get(ext, 0) + 1
-                elif item.is_dir():
-                    stats["total_directories"] += 1
+            for _, entry in self._walk_entries():
+                if entry.is_file():
+                    total_files += 1
+                    total_size += entry_size(entry)
+                    add_extension(splitext(entry.name)[1].lower())
+                elif entry.is_dir():
+                    total_directories += 1
         
         except Exception as e:
             logger.warning(f"Error calculating file statistics: {e}")
         
-        return stats
+        file_types = Counter(extensions)
+        file_types.pop("", None)  # Files without an extension are not tallied
+        
+        return {
+            "total_files": total_files,
+            "total_directories": total_directories,
+            "file_types": dict(file_types),
+            "total_size": total_size
+        }
     
-    async def _detect_patterns(self) -> List[str]:
+    def _detect_patterns_sync(self) -> List[str]:
         """Detect common patterns and architectural decisions."""
         patterns = []
         
@@ -283,7 +400,7 @@ class ProjectContextService:
         
         return patterns
     
-    async def _get_key_file_contents(self, max_size: int = 2000) -> Dict[str, str]:
+    def _get_key_file_contents_sync(self, max_size: int = 2000) -> Dict[str, str]:
         """Get contents of key files (truncated for context)."""
         key_files = [
             "package.json", "requirements.txt", "README.md",
@@ -294,7 +411,8 @@ class ProjectContextService:
         contents = {}
         
         for file_name in key_files:
-            content = await self._read_file(file_name)
+            # One character past the limit is enough to know the file needs truncating
+            content = self._read_file_head(file_name, max_size + 1)
             if content:
                 # Truncate if too long
                 if len(content) > max_size:
@@ -303,27 +421,111 @@ class ProjectContextService:
         
         return contents
     
+    def _walk_entries(self) -> Iterator[Tuple[str, os.DirEntry]]:
+        """Yield (relative path, entry) for everything outside the ignored directories."""
+        # Ignored directories are pruned by name, so their subtrees are never listed
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            for name, entry in self._list_dir(rel).items():
+                if name in IGNORED_DIRS:
+                    continue
+                path = self._join(rel, name)
+                yield path, entry
+                # Like rglob, symlinked directories are reported but not followed
+                if entry.is_dir() and not entry.is_symlink():
+                    pending.append(path)
+    
+    def _tree_fingerprint(self) -> int:
+        """Hash of every path, with mtime and size for files; changes whenever the context could."""
+        items = []
+        for path, entry in self._walk_entries():
+            # A directory's own stat adds nothing: entries added, removed or renamed
+            # below it already change the set of paths, so skip the syscall
+            if entry.is_dir():
+                items.append(path)
+                continue
+            try:
+                st = entry.stat()
+                items.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                items.append((path, None, None))  # Dangling symlink
+        return hash(frozenset(items))
+    
+    @staticmethod
+    def _join(rel: str, name: str) -> str:
+        return f"{rel}/{name}" if rel else name
+    
+    def _list_dir(self, rel: str) -> Dict[str, os.DirEntry]:
+        """Entries of a project directory by name, read with one scandir and cached."""
+        entries = self._children.get(rel)
+        if entries is None:
+            try:
+                with os.scandir(os.path.join(self._root, rel) if rel else self._root) as it:
+                    entries = {entry.name: entry for entry in it}
+            except PermissionError:
+                self._unreadable.add(rel)
+                entries = {}
+            except OSError:
+                entries = {}
+            self._children[rel] = entries
+        return entries
+    
+    def _entry(self, file_path: str) -> Optional[os.DirEntry]:
+        """Cached directory entry for a project-relative path, or None if it does not exist."""
+        parent, _, name = file_path.strip('/').rpartition('/')
+        return self._list_dir(parent).get(name)
+    
+    @staticmethod
+    def _entry_size(entry: os.DirEntry) -> int:
+        try:
+            return entry.stat().st_size
+        except OSError:
+            return 0  # Dangling symlink
+    
     def _file_exists(self, file_path: str) -> bool:
-        """Check if a file exists in the project."""
-        full_path = self.project_path / file_path
-        return full_path.exists() and full_path.is_file()
+        """Check if a file exists in the project, from the scandir cache without a stat call."""
+        entry = self._entry(file_path)
+        return entry is not None and entry.is_file()
     
-    async def _read_file(self, file_path: str) -> Optional[str]:
+    def _read_file(self, file_path: str) -> Optional[str]:
         """Read a file's content."""
         try:
-            full_path = self.project_path / file_path
-            if full_path.exists() and full_path.is_file():
-                return full_path.read_text(encoding='utf-8')
+            if self._file_exists(file_path):
+                return (self.project_path / file_path).read_text(encoding='utf-8')
+        except Exception as e:
+            logger.warning(f"Could not read file {file_path}: {e}")
+        return None
+    
+    def _read_file_head(self, file_path: str, max_chars: int) -> Optional[str]:
+        """Read at most max_chars characters from the start of a file."""
+        try:
+            if self._file_exists(file_path):
+                # Text mode decodes only the buffered chunks needed for max_chars
+                with open(os.path.join(self._root, file_path), encoding='utf-8') as f:
+                    return f.read(max_chars)
         except Exception as e:
             logger.warning(f"Could not read file {file_path}: {e}")
         return None
     
-    async def _read_json_file(self, file_path: str) -> Optional[Dict[str, Any]]:
+    def _read_json_file(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Read and parse a JSON file."""
-        content = await self._read_file(file_path)
+        if not ORJSON_AVAILABLE:
+            content = self._read_file(file_path)
+        else:
+            # orjson parses the raw bytes, so there is no decode to str first
+            try:
+                if self._file_exists(file_path):
+                    with open(os.path.join(self._root, file_path), 'rb') as f:
+                        content = f.read()
+                else:
+                    content = None
+            except Exception as e:
+                logger.warning(f"Could not read file {file_path}: {e}")
+                content = None
         if content:
             try:
-                return json.loads(content)
-            except json.JSONDecodeError as e:
+                return orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+            except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses it
                 logger.warning(f"Could not parse JSON file {file_path}: {e}")
         return None
\ No newline at end of file
@@ -10,15 +10,81 @@ import psutil
 import os
 import gc
 import signal
+import threading
+import time
 from contextlib import contextmanager
+from celery import chord, group
+from celery.signals import worker_process_init
 
 logger = logging.getLogger(__name__)
 
+# One event loop per worker thread, kept for the life of the worker so tasks
+# skip loop setup/teardown and reuse whatever the loop holds between tasks
+_worker_state = threading.local()
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Return this worker thread's event loop, creating it on first use."""
+    loop = getattr(_worker_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _worker_state.loop = loop
+    return loop
+
+def get_worker_async_redis():
+    """Async Redis client bound to this worker thread's loop, created on first use."""
+    import redis.asyncio
+
+    client = getattr(_worker_state, "async_redis", None)
+    if client is None or getattr(_worker_state, "async_redis_loop", None) is not get_worker_loop():
+        client = redis.asyncio.Redis(
+            host=redis_cache.host,
+            port=redis_cache.port,
+            db=redis_cache.db,
+            password=redis_cache.password,
+            socket_timeout=redis_cache.socket_timeout,
+            decode_responses=True
+        )
+        _worker_state.async_redis = client
+        _worker_state.async_redis_loop = get_worker_loop()
+    return client
+
+@worker_process_init.connect
+def init_worker_loop(**kwargs):
+    """Create the loop in each forked worker and connect the cache once on it."""
+    # Never reuse a loop inherited from the parent across fork
+    _worker_state.loop = None
+    _worker_state.async_redis = None
+    loop = get_worker_loop()
+    if not redis_cache._client:
+        loop.run_until_complete(redis_cache.connect())
+
+# Tasks finishing faster than this skip the RSS reads in memory_monitor
+MEMORY_SAMPLE_MIN_SECONDS = 1.0
+# Sample every task, measuring its delta from its own start
+FORCE_MEMORY_LOG = os.getenv("FORCE_MEMORY_LOG", "").lower() in ("1", "true", "yes")
+
+_process: Optional[psutil.Process] = None
+_last_rss_mb: Optional[float] = None
+
+def _current_process() -> psutil.Process:
+    """psutil handle for this process, rebuilt after a fork changes the PID."""
+    global _process
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+    return _process
+
 @contextmanager
 def memory_monitor():
-    """Context manager to monitor memory usage and cleanup on exit."""
-    process = psutil.Process(os.getpid())
-    initial_memory = process.memory_info().rss / 1024 / 1024  # MB
+    """Context manager to monitor memory usage and cleanup on exit.
+
+    RSS is only read for tasks running at least MEMORY_SAMPLE_MIN_SECONDS. Only
+    with FORCE_MEMORY_LOG is a task measured from its own start; otherwise the
+    delta is the worker's growth since the previous sample, skipped tasks included.
+    """
+    global _last_rss_mb
+    initial_memory = _current_process().memory_info().rss / 1024 / 1024 if FORCE_MEMORY_LOG else None  # MB
+    start = time.monotonic()
 
     try:
         yield
@@ -26,15 +92,26 @@ def memory_monitor():
         # Force garbage collection
         gc.collect()
 
-        # Check for memory leaks
-        final_memory = process.memory_info().rss / 1024 / 1024  # MB
-        memory_delta = final_memory - initial_memory
+        if initial_memory is not None or time.monotonic() - start >= MEMORY_SAMPLE_MIN_SECONDS:
+            final_memory = _current_process().memory_info().rss / 1024 / 1024  # MB
+            baseline = initial_memory if initial_memory is not None else _last_rss_mb
+            _last_rss_mb = final_memory
+
+            if baseline is None:
+                logger.debug(f"Memory usage: {final_memory:.1f}MB")
+            else:
+                # Check for memory leaks
+                memory_delta = final_memory - baseline
 
-        if memory_delta > 100:  # More than 100MB increase
-            logger.warning(f"Memory leak detected: {memory_delta:.1f}MB increase")
+                if memory_delta > 100:  # More than 100MB increase
+                    if initial_memory is not None:
+                        logger.warning(f"Memory leak detected: {memory_delta:.1f}MB increase")
+                    else:
+                        # Spans every task since the last sample, so not attributable to this one
+                        logger.warning(f"Worker RSS grew {memory_delta:.1f}MB since the last memory sample")
 
-        # Log memory usage
-        logger.debug(f"Memory usage: {final_memory:.1f}MB (delta: {memory_delta:+.1f}MB)")
+                # Log memory usage
+                logger.debug(f"Memory usage: {final_memory:.1f}MB (delta: {memory_delta:+.1f}MB)")
 
 def signal_handler(signum, frame):
     """Handle segmentation faults and other critical signals."""
@@ -74,36 +151,33 @@ def process_llm_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
             "sandbox_context": sandbox_context,
             "api_keys": list(api_keys.keys()) if api_keys else []
         }
+        # Serialized and hashed once, shared by the lookup and the store below
+        cache_key = redis_cache.response_cache_key(cache_key_data)
 
         # Note: In a real implementation, we'd need to make this async
         # For now, we'll process synchronously within the Celery task
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        loop = get_worker_loop()
 
-        try:
-            # Check cache
-            cached_response = loop.run_until_complete(
-                redis_cache.get_cached_response(cache_key_data)
-            )
-
-            if cached_response:
-                logger.info("Returning cached response")
-                return cached_response
+        # Check cache
+        cached_response = loop.run_until_complete(
+            redis_cache.get_cached_response(cache_key)
+        )
 
-            # Process the request using existing agent infrastructure
-            result = loop.run_until_complete(_process_request_async(
-                user_request, session_id, model, sandbox_context, sandbox_id, api_keys
-            ))
+        if cached_response:
+            logger.info("Returning cached response")
+            return cached_response
 
-            # Cache the result
-            loop.run_until_complete(
-                redis_cache.set_cached_response(cache_key_data, result, ttl_seconds=3600)
-            )
+        # Process the request using existing agent infrastructure
+        result = loop.run_until_complete(_process_request_async(
+            user_request, session_id, model, sandbox_context, sandbox_id, api_keys
+        ))
 
-            return result
+        # Cache the result
+        loop.run_until_complete(
+            redis_cache.set_cached_response(cache_key, result, ttl_seconds=3600)
+        )
 
-        finally:
-            loop.close()
+        return result
 
     except Exception as e:
         logger.error(f"Error processing LLM request: {e}")
@@ -116,25 +190,36 @@ def batch_process_requests(self, request_batch: list) -> list:
     """
     Process multiple LLM requests in batch for efficiency.
     """
-    results = []
+    if not request_batch:
+        return []
 
-    for request_data in request_batch:
-        try:
-            result = process_llm_request.apply(args=[request_data]).get()
-            results.append({
-                'request_id': request_data.get('id'),
-                'success': True,
-                'result': result
-            })
-        except Exception as e:
-            logger.error(f"Batch processing failed for request {request_data.get('id')}: {e}")
-            results.append({
-                'request_id': request_data.get('id'),
-                'success': False,
-                'error': str(e)
-            })
-
-    return results
+    # Spread the batch over the worker pool as a chord and hand this task's result
+    # over to the callback; nothing blocks a pool slot waiting on the subtasks
+    header = group(process_batch_item.s(request_data) for request_data in request_batch)
+    return self.replace(chord(header, format_batch_results.s(request_batch)))
+
+@celery_app.task(name='process_batch_item')
+def process_batch_item(request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Process one request of a batch; failures are returned so the chord still completes."""
+    try:
+        return {
+            'success': True,
+            'result': process_llm_request.apply(args=[request_data]).get()
+        }
+    except Exception as e:
+        logger.error(f"Batch processing failed for request {request_data.get('id')}: {e}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@celery_app.task(name='format_batch_results')
+def format_batch_results(outcomes: list, request_batch: list) -> list:
+    """Chord callback: pair each outcome, in batch order, with its request ID."""
+    return [
+        {'request_id': request_data.get('id'), **outcome}
+        for request_data, outcome in zip(request_batch, outcomes)
+    ]
 
 @celery_app.task(bind=True, name='cleanup_expired_cache')
 def cleanup_expired_cache(self) -> Dict[str, Any]:
@@ -146,18 +231,12 @@ def cleanup_expired_cache(self) -> Dict[str, Any]:
         logger.info("Running cache cleanup task")
 
         # Get cache stats
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        try:
-            stats = loop.run_until_complete(redis_cache.get_cache_stats())
-            return {
-                'success': True,
-                'stats': stats,
-                'cleaned_entries': 0  # Redis handles this automatically
-            }
-        finally:
-            loop.close()
+        stats = get_worker_loop().run_until_complete(redis_cache.get_cache_stats())
+        return {
+            'success': True,
+            'stats': stats,
+            'cleaned_entries': 0  # Redis handles this automatically
+        }
 
     except Exception as e:
         logger.error(f"Error in cache cleanup: {e}")
@@ -229,6 +308,10 @@ async def _process_request_async(user_request: str, session_id: str, model: str,
             "error": True
         }
 
+# How long process_queued_requests waits on an empty queue before finishing;
+# kept under the Redis client's 5s socket timeout so the blocking pop can return
+QUEUE_POP_TIMEOUT_SECONDS = 4
+
 @celery_app.task(bind=True, name='process_queued_requests')
 def process_queued_requests(self, provider: str) -> Dict[str, Any]:
     """
@@ -241,17 +324,21 @@ def process_queued_requests(self, provider: str) -> Dict[str, Any]:
     try:
         logger.info(f"Starting queued request processing for provider: {provider}")
 
-        # Initialize rate limiter
-        rate_limiter = RateLimiter(redis_cache.redis_client)
+        # Initialize rate limiter; its methods are coroutines on an async client,
+        # run on the worker loop
+        rate_limiter = RateLimiter(get_worker_async_redis())
+        loop = get_worker_loop()
 
         processed_count = 0
         failed_count = 0
-        max_iterations = 100  # Prevent infinite loops
+        max_iterations = 100  # Bounds how long one task holds the queue
 
         for _ in range(max_iterations):
             try:
-                # Get next queued request
-                queued_item = rate_limiter.get_next_queued_request(provider)
+                # Block until a request arrives instead of polling
+                queued_item = loop.run_until_complete(
+                    rate_limiter.get_next_queued_request(provider, timeout=QUEUE_POP_TIMEOUT_SECONDS)
+                )
 
                 if not queued_item:
                     logger.info(f"No more queued requests for {provider}")
@@ -264,16 +351,16 @@ def process_queued_requests(self, provider: str) -> Dict[str, Any]:
                 # Use a hash of the API key for tracking (simplified)
                 api_key_hash = "default"  # In practice, get from request_data
 
-                can_proceed, queue_length, wait_seconds = rate_limiter.check_api_limits(
-                    provider=provider,
-                    api_key_hash=api_key_hash
+                # Checks the limits and, if allowed, records the call in one atomic step
+                can_proceed, queue_length, wait_seconds = loop.run_until_complete(
+                    rate_limiter.acquire_api_slot(provider=provider, api_key_hash=api_key_hash)
                 )
 
                 if not can_proceed:
                     if wait_seconds and wait_seconds > 0:
                         logger.info(f"Still rate limited for {provider}, waiting {wait_seconds}s")
                         # Re-queue the request
-                        rate_limiter.queue_request(provider, request_data)
+                        loop.run_until_complete(rate_limiter.queue_request(provider, request_data))
                         break
                     else:
                         logger.warning(f"Cannot proceed with request for {provider}")
@@ -282,16 +369,9 @@ def process_queued_requests(self, provider: str) -> Dict[str, Any]:
                 # Process the request
                 result = process_llm_request.apply(args=[request_data]).get(timeout=300)
 
-                # Record the API call
-                rate_limiter.record_api_call(provider, api_key_hash)
-
                 processed_count += 1
                 logger.info(f"Successfully processed queued request {queued_item['id']}")
 
-                # Small delay to prevent overwhelming the system
-                import time
-                time.sleep(0.1)
-
             except Exception as e:
                 logger.error(f"Failed to process queued request: {e}")
                 failed_count += 1
@@ -302,7 +382,7 @@ def process_queued_requests(self, provider: str) -> Dict[str, Any]:
             'provider': provider,
             'processed_count': processed_count,
             'failed_count': failed_count,
-            'remaining_queue': rate_limiter.get_queue_length(provider)
+            'remaining_queue': loop.run_until_complete(rate_limiter.get_queue_length(provider))
         }
 
     except Exception as e:
@@ -0,0 +1,90 @@
+"""
+Parallel directory removal for large, deeply nested trees such as node_modules.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+
+def _default_workers() -> int:
+    # Unlinks spend their time in the kernel, so oversubscribe the cores
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def _sorted_entries(path: str) -> List[os.DirEntry]:
+    """Directory entries in inode order, which ext4/xfs unlink with far fewer seeks (bpo-32453)"""
+    with os.scandir(path) as it:
+        return sorted(it, key=lambda entry: entry.inode())
+
+
+def _clear_directory(path: str) -> List[str]:
+    """Unlink every non-directory entry in path and return its subdirectories"""
+    subdirs: List[str] = []
+    try:
+        entries = _sorted_entries(path)
+    except FileNotFoundError:
+        return subdirs
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = False
+        if is_dir:
+            subdirs.append(entry.path)
+        else:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+    return subdirs
+
+
+def _rmdir(path: str):
+    try:
+        os.rmdir(path)
+    except FileNotFoundError:
+        pass
+
+
+def fast_rmtree(root: str, max_workers: Optional[int] = None) -> None:
+    """
+    Remove a directory tree using a thread pool.
+
+    The tree is cleared one depth level at a time, each directory's files being
+    unlinked by a worker as it is scanned. Directories are then removed deepest
+    level first, every level in parallel. Symlinks are unlinked, never followed.
+    """
+    if os.path.islink(root):
+        raise OSError(f"Cannot call rmtree on a symbolic link: {root}")
+
+    levels = [[root]]
+    with ThreadPoolExecutor(max_workers=max_workers or _default_workers()) as pool:
+        level = [root]
+        while level:
+            level = [sub for subdirs in pool.map(_clear_directory, level) for sub in subdirs]
+            if level:
+                levels.append(level)
+        for level in reversed(levels):
+            list(pool.map(_rmdir, level))
+
+
+def force_rmtree(root: str) -> None:
+    """
+    Best-effort sequential removal, bottom-up in inode order.
+
+    Entries that cannot be deleted are skipped; only failing to remove root
+    itself raises.
+    """
+    try:
+        entries = _sorted_entries(root)
+    except OSError:
+        entries = []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                force_rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+        except OSError:
+            pass  # Ignore individual deletion errors
+    os.rmdir(root)
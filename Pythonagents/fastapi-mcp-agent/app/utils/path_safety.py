@@ -6,13 +6,36 @@ to prevent path traversal attacks and unauthorized file system access.
 """
 
 import os
+import re
+import errno
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Optional, Set, Union, Tuple, Dict
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Resolved-path decisions kept per validator
+VALIDATION_CACHE_SIZE = 4096
+
+# Project-relative prefixes under which delete operations are allowed
+ALLOWED_DELETE_PREFIXES = ("sandboxes", "temp", "tmp", "cache")
+
+def _realpath(path_str: str) -> str:
+    """
+    os.path.realpath with Path.resolve()'s loop check: realpath leaves a
+    symlink loop unresolved, so stat the result and fail on ELOOP as resolve() does.
+    """
+    full_str = os.path.realpath(path_str)
+    try:
+        os.stat(full_str)
+    except OSError as e:
+        if e.errno == errno.ELOOP:
+            raise RuntimeError(f"Symlink loop from {e.filename!r}")
+    return full_str
+
 class PathValidationError(Exception):
     """Custom exception for path validation errors."""
     pass
@@ -37,6 +60,9 @@ class PathSafetyValidator:
             project_root: The root directory for the project
         """
         self.project_root = Path(project_root).resolve()
+        # String forms for the string-based checks, converted once
+        self._project_root_str = str(self.project_root)
+        self._project_root_prefix = os.path.join(self._project_root_str, "")
         
         # Define allowed directories relative to project root (sandboxes directory)
         self.allowed_directories = {
@@ -121,6 +147,14 @@ class PathSafetyValidator:
             "venv",
             ".venv"
         }
+        self._forbidden_re = self._compile_forbidden_patterns(self.forbidden_patterns)
+        
+        # Outcome of the checks that depend only on the resolved path, keyed by
+        # (resolved path, access level, operation); None means allowed, otherwise
+        # the error message prefix. Cleared when the allowed directories change.
+        self._decision_cache: "OrderedDict[Tuple[str, AccessLevel, str], Optional[str]]" = OrderedDict()
+        self._decision_lock = threading.Lock()
+        self._allowed_index = self._build_allowed_index()
         
         # Define dangerous file extensions
         self.dangerous_extensions = {
@@ -139,6 +173,8 @@ class PathSafetyValidator:
             "C:\\Users\\Administrator", "C:\\System32",
             "/System", "/Library", "/Applications", "/private"
         }
+        # Tuple form for a single C-level str.startswith call
+        self._system_directory_prefixes = tuple(self.system_directories)
 
     def validate_path(self, 
                      file_path: Union[str, Path], 
@@ -166,140 +202,184 @@ class PathSafetyValidator:
             if path.is_absolute():
                 return False, path, f"Absolute paths are not allowed: {file_path}"
             
-            # Resolve the full path relative to project root
-            full_path = (self.project_root / path).resolve()
-            
-            # 1. Check for symlink attacks
-            if self._contains_symlink(path):
-                return False, full_path, f"Symlink detected in path: {file_path}"
+            # 1-6. Checks on the lexically normalised path, cached. Without
+            # symlinks this is exactly the resolved path, so rejected paths never
+            # pay for resolve()
+            joined_path = os.path.normpath(os.path.join(self.project_root, path))
+            error_prefix = self._cached_decision(joined_path, access_level, operation)
+            if error_prefix is not None:
+                return False, Path(joined_path), f"{error_prefix}{file_path}"
             
-            # 2. Check if path escapes project root
-            if not self._is_within_project_root(full_path):
-                return False, full_path, f"Path escapes project root: {file_path}"
-            
-            # 3. Check for system directory access
-            if self._is_system_directory(full_path):
-                return False, full_path, f"Access to system directory denied: {file_path}"
-            
-            # 4. Check forbidden patterns
-            if self._matches_forbidden_pattern(full_path):
-                return False, full_path, f"Access to forbidden file/directory: {file_path}"
-            
-            # 5. Check dangerous file extensions
-            if self._has_dangerous_extension(full_path):
-                return False, full_path, f"Access to dangerous file extension denied: {file_path}"
-            
-            # 6. Check access level permissions
-            if not self._check_access_level(full_path, access_level):
-                return False, full_path, f"Insufficient permissions for {access_level.value}: {file_path}"
-            
-            # 7. Check operation-specific restrictions
-            if not self._check_operation_permissions(full_path, operation, access_level):
-                return False, full_path, f"Operation '{operation}' not allowed on: {file_path}"
+            # 7. Check for symlink attacks; any symlink is rejected, so every
+            # path that passes has the same decision resolved as normalised
+            # realpath works on the string, as Path.resolve() does underneath,
+            # without the intermediate Path objects
+            full_str = _realpath(os.path.join(self._project_root_str, path))
+            if self._contains_symlink(path, full_str):
+                return False, Path(full_str), f"Symlink detected in path: {file_path}"
             
             # Log successful validation
-            logger.debug(f"Path validation successful: {file_path} -> {full_path}")
-            return True, full_path, None
+            logger.debug(f"Path validation successful: {file_path} -> {full_str}")
+            return True, Path(full_str), None
             
         except Exception as e:
             logger.error(f"Path validation error for {file_path}: {str(e)}")
             return False, Path(), f"Path validation failed: {str(e)}"
 
-    def _contains_symlink(self, path: Path) -> bool:
-        """Check if any component in the path is a symlink."""
-        try:
-            current_path = self.project_root
-            for part in path.parts:
-                current_path = current_path / part
-                if current_path.exists() and current_path.is_symlink():
-                    return True
-            return False
-        except (OSError, PermissionError):
-            # If we can't check, assume it's unsafe
-            return True
+    def _cached_decision(self, path_str: str, access_level: AccessLevel, operation: str) -> Optional[str]:
+        """LRU-cached _decide; the symlink check stays per call since the filesystem can change."""
+        key = (path_str, access_level, operation)
+        with self._decision_lock:
+            if key in self._decision_cache:
+                self._decision_cache.move_to_end(key)
+                return self._decision_cache[key]
+        
+        decision = self._decide(path_str, access_level, operation)
+        with self._decision_lock:
+            self._decision_cache[key] = decision
+            if len(self._decision_cache) > VALIDATION_CACHE_SIZE:
+                self._decision_cache.popitem(last=False)
+        return decision
+
+    def _decide(self, full_str: str, access_level: AccessLevel, operation: str) -> Optional[str]:
+        """Run the path-only checks, returning the error message prefix of the first failure."""
+        # 1. Check if path escapes project root
+        if not self._is_within_project_root(full_str):
+            return "Path escapes project root: "
+        
+        # 2. Check for system directory access
+        if self._is_system_directory(full_str):
+            return "Access to system directory denied: "
+        
+        # 3. Check forbidden patterns
+        full_lower = full_str.lower()
+        if self._matches_forbidden_pattern(full_lower):
+            return "Access to forbidden file/directory: "
+        
+        # 4. Check dangerous file extensions
+        if self._has_dangerous_extension(full_lower):
+            return "Access to dangerous file extension denied: "
+        
+        # 5. Check access level permissions
+        relative_str = full_str[len(self._project_root_prefix):] or '.'
+        if not self._check_access_level(relative_str, access_level):
+            return f"Insufficient permissions for {access_level.value}: "
+        
+        # 6. Check operation-specific restrictions
+        if not self._check_operation_permissions(relative_str, operation, access_level):
+            return f"Operation '{operation}' not allowed on: "
+        
+        return None
 
-    def _is_within_project_root(self, full_path: Path) -> bool:
-        """Check if the resolved path is within the project root."""
+    def _contains_symlink(self, path: Path, full_str: Optional[str] = None) -> bool:
+        """
+        Check if any component in the path is a symlink.
+        
+        The project root is already resolved, so the lexically normalised path
+        and the resolved one can only differ if resolving followed a symlink.
+        Pass the resolved path when it is at hand to avoid resolving twice.
+        Paths with ".." are walked component by component instead, since
+        normalising can cancel out a symlink that resolves back in place.
+        """
         try:
-            # Use relative_to to check containment - will raise ValueError if not contained
-            full_path.relative_to(self.project_root)
+            if ".." in path.parts:
+                current_path = self.project_root
+                for part in path.parts:
+                    current_path = current_path / part
+                    if current_path.is_symlink():
+                        return True
+                return False
+            if full_str is None:
+                full_str = _realpath(os.path.join(self._project_root_str, path))
+            naive_path = os.path.normpath(os.path.join(self._project_root_str, path))
+            return naive_path != full_str
+        except (OSError, RuntimeError):
+            # If we can't check (e.g. a symlink loop), assume it's unsafe
             return True
-        except ValueError:
-            return False
 
-    def _is_system_directory(self, full_path: Path) -> bool:
+    def _is_within_project_root(self, full_str: str) -> bool:
+        """Check if the normalised path is within the project root."""
+        # The separator-terminated prefix keeps "/root_other" out of "/root"
+        return full_str == self._project_root_str or full_str.startswith(self._project_root_prefix)
+
+    def _is_system_directory(self, full_str: str) -> bool:
         """Check if path points to a system directory."""
-        path_str = str(full_path)
-        return any(path_str.startswith(sys_dir) for sys_dir in self.system_directories)
+        return full_str.startswith(self._system_directory_prefixes)
 
-    def _matches_forbidden_pattern(self, full_path: Path) -> bool:
-        """Check if path matches any forbidden patterns."""
-        path_str = str(full_path).lower()
-        name = full_path.name.lower()
+    @staticmethod
+    def _compile_forbidden_patterns(patterns: Set[str]) -> "re.Pattern":
+        """
+        Compile forbidden patterns into one regex searched over the lowercased path.
         
-        for pattern in self.forbidden_patterns:
+        Wildcard patterns ("*.pem") must end the path, i.e. the file name; any
+        other pattern matches anywhere in the path, which also covers an exact
+        file name match.
+        """
+        alternatives = []
+        for pattern in sorted(patterns):
             if pattern.startswith('*'):
-                # Handle wildcard patterns
-                if name.endswith(pattern[1:]):
-                    return True
-            elif pattern in path_str or pattern == name:
-                return True
-        return False
-
-    def _has_dangerous_extension(self, full_path: Path) -> bool:
-        """Check if file has a potentially dangerous extension."""
-        return full_path.suffix.lower() in self.dangerous_extensions
-
-    def _check_access_level(self, full_path: Path, access_level: AccessLevel) -> bool:
-        """Check if the path is allowed for the given access level."""
-        try:
-            relative_path = full_path.relative_to(self.project_root)
-            path_parts = relative_path.parts
-            
-            # Handle the case where path is the current directory
-            if str(relative_path) == '.':
-                path_parts = ('.',)
-            
-            if not path_parts:
-                return False
-            
-            # Check if the top-level directory is allowed for this access level
-            top_dir = path_parts[0]
-            
-            # For READ_WRITE access, check both READ_WRITE and READ_ONLY allowed dirs
+                alternatives.append(re.escape(pattern[1:]) + r'\Z')
+            else:
+                alternatives.append(re.escape(pattern))
+        return re.compile('|'.join(alternatives))
+
+    def _matches_forbidden_pattern(self, full_lower: str) -> bool:
+        """Check if the lowercased path matches any forbidden patterns."""
+        return self._forbidden_re.search(full_lower) is not None
+
+    def _has_dangerous_extension(self, full_lower: str) -> bool:
+        """Check if the lowercased path has a potentially dangerous extension."""
+        return os.path.splitext(full_lower)[1] in self.dangerous_extensions
+
+    def _build_allowed_index(self) -> Dict[AccessLevel, Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...], bool]]:
+        """
+        Split each level's allowed entries into (literals, "prefix*" prefixes,
+        "*suffix" suffixes, bare "*") so checks need no per-call pattern parsing.
+        READ_WRITE also admits everything READ_ONLY does.
+        """
+        index = {}
+        for access_level in AccessLevel:
             if access_level == AccessLevel.READ_WRITE:
-                allowed_dirs = (self.allowed_directories[AccessLevel.READ_WRITE] | 
-                              self.allowed_directories[AccessLevel.READ_ONLY])
+                allowed_dirs = (self.allowed_directories.get(AccessLevel.READ_WRITE, set()) |
+                                self.allowed_directories.get(AccessLevel.READ_ONLY, set()))
             else:
                 allowed_dirs = self.allowed_directories.get(access_level, set())
             
-            # Check if any allowed directory matches the path
+            literals, prefixes, suffixes, allow_any = [], [], [], False
             for allowed_dir in allowed_dirs:
-                # Handle wildcard patterns
-                if "*" in allowed_dir:
-                    if allowed_dir == "*":
-                        # Allow any directory
-                        return True
-                    elif allowed_dir.endswith("*"):
-                        # Pattern like "sandbox_*"
-                        prefix = allowed_dir[:-1]
-                        if top_dir.startswith(prefix):
-                            return True
-                    elif allowed_dir.startswith("*"):
-                        # Pattern like "*.txt"
-                        suffix = allowed_dir[1:]
-                        if str(relative_path).endswith(suffix):
-                            return True
-                # Exact match or path starts with allowed directory
-                elif str(relative_path).startswith(allowed_dir) or top_dir == allowed_dir:
-                    return True
-            
-            return False
-            
-        except ValueError:
-            return False
+                if "*" not in allowed_dir:
+                    literals.append(allowed_dir)
+                elif allowed_dir == "*":
+                    allow_any = True
+                elif allowed_dir.endswith("*"):
+                    # Pattern like "sandbox_*"
+                    prefixes.append(allowed_dir[:-1])
+                elif allowed_dir.startswith("*"):
+                    # Pattern like "*.txt"
+                    suffixes.append(allowed_dir[1:])
+            index[access_level] = (tuple(literals), tuple(prefixes), tuple(suffixes), allow_any)
+        return index
+
+    def _allowed_directories_changed(self):
+        """Rebuild the allowed-directory index and drop decisions made with the old one."""
+        with self._decision_lock:
+            self._allowed_index = self._build_allowed_index()
+            self._decision_cache.clear()
 
-    def _check_operation_permissions(self, full_path: Path, operation: str, access_level: AccessLevel) -> bool:
+    def _check_access_level(self, relative_str: str, access_level: AccessLevel) -> bool:
+        """Check if the project-relative path ('.' for the root) is allowed for the given access level."""
+        # The current directory is its own top-level name
+        top_dir = relative_str.split(os.sep, 1)[0]
+        
+        literals, prefixes, suffixes, allow_any = self._allowed_index[access_level]
+        # Literals match the path start (so also the exact top-level name),
+        # "prefix*" the top-level name and "*suffix" the path end
+        return (allow_any
+                or relative_str.startswith(literals)
+                or top_dir.startswith(prefixes)
+                or relative_str.endswith(suffixes))
+
+    def _check_operation_permissions(self, relative_str: str, operation: str, access_level: AccessLevel) -> bool:
         """Check operation-specific permissions."""
         # Read operations are generally allowed if path validation passes
         if operation in ["read", "list", "search"]:
@@ -311,14 +391,8 @@ class PathSafetyValidator:
         
         # Delete operations are more restricted
         if operation in ["delete", "remove"]:
-            # Only allow deletion in specific directories
-            try:
-                relative_path = full_path.relative_to(self.project_root)
-                # Allow deletion in sandboxes and temp directories
-                allowed_delete_dirs = {"sandboxes", "temp", "tmp", "cache"}
-                return any(str(relative_path).startswith(d) for d in allowed_delete_dirs)
-            except ValueError:
-                return False
+            # Only allow deletion in specific directories, i.e. sandboxes and temp
+            return relative_str.startswith(ALLOWED_DELETE_PREFIXES)
         
         # Execute operations are highly restricted
         if operation in ["execute", "run"]:
@@ -371,12 +445,14 @@ class PathSafetyValidator:
         if access_level not in self.allowed_directories:
             self.allowed_directories[access_level] = set()
         self.allowed_directories[access_level].add(directory)
+        self._allowed_directories_changed()
         logger.info(f"Added allowed directory: {directory} for {access_level.value}")
 
     def remove_allowed_directory(self, directory: str, access_level: AccessLevel):
         """Remove an allowed directory from an access level."""
         if access_level in self.allowed_directories:
             self.allowed_directories[access_level].discard(directory)
+            self._allowed_directories_changed()
             logger.info(f"Removed allowed directory: {directory} from {access_level.value}")
 
 
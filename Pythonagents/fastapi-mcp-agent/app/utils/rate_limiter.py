@@ -1,29 +1,151 @@
-import redis
+import redis.asyncio as redis
+import asyncio
 import time
 import json
-from typing import Optional, Dict, Any, Tuple
+import hashlib
+from typing import Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, field
 import logging
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Token buckets for both limits, kept in one hash with the time of the last
+# refill. Each refills continuously at its limit spread over the window, so
+# unlike fixed windows there is no double burst across a window boundary.
+# A fully refilled hash is identical to a missing one, so it may expire then.
+# KEYS: bucket hash, queue
+# ARGV: requests per minute, requests per hour, now in ms, cost, take (1) or peek (0)
+TOKEN_BUCKET_LUA = """
+local rpm = tonumber(ARGV[1])
+local rph = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'm', 'h', 'ts')
+local elapsed = math.max(0, now - (tonumber(state[3]) or now)) / 1000
+local minute = math.min(rpm, (tonumber(state[1]) or rpm) + elapsed * rpm / 60)
+local hour = math.min(rph, (tonumber(state[2]) or rph) + elapsed * rph / 3600)
+if minute >= cost and hour >= cost then
+    if ARGV[5] == '1' then
+        minute = minute - cost
+        hour = hour - cost
+        redis.call('HSET', KEYS[1], 'm', minute, 'h', hour, 'ts', now)
+        redis.call('PEXPIRE', KEYS[1], 3600000)
+    end
+    return {1, math.floor(minute), math.floor(hour), 0}
+end
+local wait = math.max((cost - minute) * 60 / rpm, (cost - hour) * 3600 / rph)
+return {0, math.floor(minute), math.floor(hour), math.ceil(wait * 1000), redis.call('LLEN', KEYS[2])}
+"""
+
+# Leased tokens not spent within this many seconds are dropped, so a lease
+# cannot be spent long after Redis counted it
+LOCAL_LEASE_SECONDS = 10.0
+
+@dataclass
+class LocalLease:
+    """Tokens taken from the Redis buckets in one batch and handed out in-process."""
+    tokens: int = 0
+    expires: float = 0.0
+    # No batch is attempted before this time after one did not fit
+    batch_after: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
 class RateLimiter:
-    """Redis-based rate limiter for external API calls with intelligent queuing."""
+    """
+    Redis-based rate limiter for external API calls with intelligent queuing.
+
+    With hiredis installed (the redis[hiredis] requirement), redis-py decodes
+    replies in C instead of its pure-Python parser; clients need no parser_class.
+    """
 
-    def __init__(self, redis_client: redis.Redis, prefix: str = "api_ratelimit"):
+    def __init__(self, redis_client: redis.Redis, prefix: str = "api_ratelimit",
+                 local_lease_size: int = 1):
         self.redis = redis_client
         self.prefix = prefix
-
-    def _get_usage_key(self, provider: str, api_key_hash: str) -> str:
-        """Generate Redis key for tracking API usage."""
-        return f"{self.prefix}:usage:{provider}:{api_key_hash}"
+        # With a lease size above 1, acquire_api_slot takes that many tokens per
+        # script call and serves the rest without a Redis round-trip. Meant for
+        # keys used mostly by one worker: the limit still holds across workers,
+        # but leased tokens are unavailable to the others until spent or dropped.
+        self.local_lease_size = local_lease_size
+        self._leases: Dict[Tuple[str, str], LocalLease] = {}
+        # Runs via EVALSHA, reloading the script if the server has flushed it
+        self._token_bucket = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+    def _get_bucket_key(self, provider: str, api_key_hash: str) -> str:
+        """Generate Redis key for the token buckets tracking API usage."""
+        return f"{self.prefix}:bucket:{provider}:{api_key_hash}"
 
     def _get_queue_key(self, provider: str) -> str:
         """Generate Redis key for request queue."""
         return f"{self.prefix}:queue:{provider}"
 
-    def _get_reset_time_key(self, provider: str, api_key_hash: str) -> str:
-        """Generate Redis key for rate limit reset time."""
-        return f"{self.prefix}:reset:{provider}:{api_key_hash}"
+    @staticmethod
+    def _dumps(item: Dict[str, Any]):
+        """Serialize a queue item; orjson writes bytes, which redis-py sends as is."""
+        if ORJSON_AVAILABLE:
+            # Non-string keys are stringified, as json.dumps does
+            return orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(item)
+
+    @staticmethod
+    def _request_digest(request_data: Dict[str, Any]) -> str:
+        """Stable digest of a request's canonical JSON, the same in every process."""
+        if ORJSON_AVAILABLE:
+            canonical = orjson.dumps(request_data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        else:
+            canonical = json.dumps(request_data, sort_keys=True, separators=(",", ":")).encode()
+        return hashlib.blake2b(canonical, digest_size=8).hexdigest()
+
+    async def _run_token_bucket(self, provider: str, api_key_hash: str,
+                                requests_per_minute: int, requests_per_hour: int,
+                                take: bool) -> Tuple[bool, int, Optional[float]]:
+        """Run the token bucket script once; a slot is only spent when take is set."""
+        result = await self._token_bucket(
+            keys=[self._get_bucket_key(provider, api_key_hash), self._get_queue_key(provider)],
+            args=[requests_per_minute, requests_per_hour, int(time.time() * 1000), 1, 1 if take else 0]
+        )
+
+        if result[0]:
+            return True, 0, None
+
+        _, minute_tokens, hour_tokens, wait_ms, queue_length = result
+        logger.warning(f"Rate limit exceeded for {provider}: minute_tokens={minute_tokens}/{requests_per_minute}, hour_tokens={hour_tokens}/{requests_per_hour}, queue={queue_length}")
+        return False, queue_length, wait_ms / 1000
+
+    async def _take_leased_token(self, provider: str, api_key_hash: str,
+                                 requests_per_minute: int, requests_per_hour: int) -> bool:
+        """Spend a leased token, leasing a new batch when the lease is used up or stale."""
+        lease = self._leases.setdefault((provider, api_key_hash), LocalLease())
+        # Per-key lock, so one key renewing its lease does not hold up the others
+        async with lease.lock:
+            now = time.time()
+            if lease.tokens and now < lease.expires:
+                lease.tokens -= 1
+                return True
+            if now < lease.batch_after:
+                return False
+
+            result = await self._token_bucket(
+                keys=[self._get_bucket_key(provider, api_key_hash), self._get_queue_key(provider)],
+                args=[requests_per_minute, requests_per_hour, int(now * 1000), self.local_lease_size, 1]
+            )
+            if not result[0]:
+                # Near the limit a whole batch no longer fits; go token by token
+                # for a while rather than paying for a failed batch every call
+                lease.tokens = 0
+                lease.batch_after = now + LOCAL_LEASE_SECONDS
+                return False
+
+            lease.tokens = self.local_lease_size - 1
+            lease.expires = now + LOCAL_LEASE_SECONDS
+            logger.debug(f"Leased {self.local_lease_size} API calls for {provider}")
+            return True
 
     async def check_api_limits(self, provider: str, api_key_hash: str,
                               requests_per_minute: int = 60,
@@ -41,68 +163,53 @@ class RateLimiter:
             (can_proceed: bool, queue_length: int, wait_seconds: Optional[float])
         """
         try:
-            usage_key = self._get_usage_key(provider, api_key_hash)
-            reset_key = self._get_reset_time_key(provider, api_key_hash)
-
-            # Get current usage counts
-            current_minute = int(time.time() // 60)
-            current_hour = int(time.time() // 3600)
-
-            minute_key = f"{usage_key}:minute:{current_minute}"
-            hour_key = f"{usage_key}:hour:{current_hour}"
-
-            minute_count = int(self.redis.get(minute_key) or 0)
-            hour_count = int(self.redis.get(hour_key) or 0)
-
-            # Check rate limits
-            minute_limit_exceeded = minute_count >= requests_per_minute
-            hour_limit_exceeded = hour_count >= requests_per_hour
+            lease = self._leases.get((provider, api_key_hash))
+            if lease and lease.tokens and time.time() < lease.expires:
+                return True, 0, None
+            return await self._run_token_bucket(provider, api_key_hash,
+                                                requests_per_minute, requests_per_hour, take=False)
 
-            if minute_limit_exceeded or hour_limit_exceeded:
-                # Calculate wait time until next window
-                reset_time = float(self.redis.get(reset_key) or time.time())
-                wait_seconds = max(0, reset_time - time.time())
+        except Exception as e:
+            logger.error(f"Rate limit check failed: {e}")
+            # Allow request on Redis failure to avoid blocking
+            return True, 0, None
 
-                # Get queue length
-                queue_key = self._get_queue_key(provider)
-                queue_length = self.redis.llen(queue_key)
+    async def acquire_api_slot(self, provider: str, api_key_hash: str,
+                               requests_per_minute: int = 60,
+                               requests_per_hour: int = 1000) -> Tuple[bool, int, Optional[float]]:
+        """
+        Check the limits and take a token in one atomic server-side step.
 
-                logger.warning(f"Rate limit exceeded for {provider}: minute={minute_count}/{requests_per_minute}, hour={hour_count}/{requests_per_hour}, queue={queue_length}")
-                return False, queue_length, wait_seconds
+        Unlike check_api_limits followed by record_api_call, concurrent callers
+        cannot both pass the check for the last free slot. A granted slot is
+        already recorded.
 
-            # Within limits, can proceed
-            return True, 0, None
+        Returns:
+            (can_proceed: bool, queue_length: int, wait_seconds: Optional[float])
+        """
+        try:
+            if self.local_lease_size > 1 and await self._take_leased_token(
+                    provider, api_key_hash, requests_per_minute, requests_per_hour):
+                return True, 0, None
+            allowed, queue_length, wait_seconds = await self._run_token_bucket(
+                provider, api_key_hash, requests_per_minute, requests_per_hour, take=True)
+            if allowed:
+                logger.debug(f"Recorded API call for {provider}")
+            return allowed, queue_length, wait_seconds
 
         except Exception as e:
             logger.error(f"Rate limit check failed: {e}")
             # Allow request on Redis failure to avoid blocking
             return True, 0, None
 
-    async def record_api_call(self, provider: str, api_key_hash: str) -> None:
-        """Record an API call for rate limiting."""
+    async def record_api_call(self, provider: str, api_key_hash: str,
+                              requests_per_minute: int = 60,
+                              requests_per_hour: int = 1000) -> None:
+        """Record an API call for rate limiting; an empty bucket is left as is."""
         try:
-            usage_key = self._get_usage_key(provider, api_key_hash)
-            reset_key = self._get_reset_time_key(provider, api_key_hash)
-
-            current_minute = int(time.time() // 60)
-            current_hour = int(time.time() // 3600)
-
-            minute_key = f"{usage_key}:minute:{current_minute}"
-            hour_key = f"{usage_key}:hour:{current_hour}"
-
-            # Increment counters with expiration
-            self.redis.incr(minute_key)
-            self.redis.incr(hour_key)
-
-            # Set expiration for minute and hour windows
-            self.redis.expire(minute_key, 120)  # 2 minutes
-            self.redis.expire(hour_key, 7200)  # 2 hours
-
-            # Update reset time
-            reset_time = (current_minute + 1) * 60  # Next minute
-            self.redis.set(reset_key, reset_time, ex=120)
-
-            logger.debug(f"Recorded API call for {provider}: minute_key={minute_key}")
+            if (await self._run_token_bucket(provider, api_key_hash,
+                                             requests_per_minute, requests_per_hour, take=True))[0]:
+                logger.debug(f"Recorded API call for {provider}")
 
         except Exception as e:
             logger.error(f"Failed to record API call: {e}")
@@ -120,17 +227,18 @@ class RateLimiter:
         """
         try:
             queue_key = self._get_queue_key(provider)
-            queue_id = f"{provider}:{int(time.time())}:{hash(str(request_data))}"
+            now = time.time()
+            queue_id = f"{provider}:{int(now * 1000)}:{self._request_digest(request_data)}"
 
             queued_item = {
                 "id": queue_id,
                 "data": request_data,
                 "provider": provider,
-                "timestamp": time.time()
+                "timestamp": now
             }
 
             # Add to queue (Redis list)
-            self.redis.rpush(queue_key, json.dumps(queued_item))
+            await self.redis.rpush(queue_key, self._dumps(queued_item))
 
             logger.info(f"Queued request {queue_id} for {provider}")
             return queue_id
@@ -139,10 +247,14 @@ class RateLimiter:
             logger.error(f"Failed to queue request: {e}")
             raise
 
-    async def get_next_queued_request(self, provider: str) -> Optional[Dict[str, Any]]:
+    async def get_next_queued_request(self, provider: str, timeout: float = 0) -> Optional[Dict[str, Any]]:
         """
         Get the next request from the queue.
 
+        Args:
+            provider: API provider name
+            timeout: Seconds to block waiting for a request; 0 returns at once
+
         Returns:
             queued_item: Next item to process, or None if queue empty
         """
@@ -150,12 +262,18 @@ class RateLimiter:
             queue_key = self._get_queue_key(provider)
 
             # Get first item from queue
-            item_json = self.redis.lpop(queue_key)
+            if timeout > 0:
+                # Blocking pop from the head (FIFO, as items are pushed to the tail);
+                # the event loop stays free while Redis waits
+                popped = await self.redis.blpop([queue_key], timeout)
+                item_json = popped[1] if popped else None
+            else:
+                item_json = await self.redis.lpop(queue_key)
 
             if not item_json:
                 return None
 
-            queued_item = json.loads(item_json)
+            queued_item = orjson.loads(item_json) if ORJSON_AVAILABLE else json.loads(item_json)
             logger.info(f"Dequeued request {queued_item['id']} for {provider}")
             return queued_item
 
@@ -167,40 +285,51 @@ class RateLimiter:
         """Get the current queue length for a provider."""
         try:
             queue_key = self._get_queue_key(provider)
-            return self.redis.llen(queue_key)
+            return await self.redis.llen(queue_key)
         except Exception as e:
             logger.error(f"Failed to get queue length: {e}")
             return 0
 
     async def get_provider_limits(self, provider: str) -> Dict[str, Any]:
         """Get current usage stats for a provider."""
+        return (await self.get_many_provider_limits([provider]))[0]
+
+    async def get_many_provider_limits(self, providers: List[str]) -> List[Dict[str, Any]]:
+        """Get current usage stats for several providers in one round-trip."""
         try:
             # This is a simplified implementation - in practice you'd track per API key
             api_key_hash = "default"  # Placeholder
-            usage_key = self._get_usage_key(provider, api_key_hash)
-
-            current_minute = int(time.time() // 60)
-            current_hour = int(time.time() // 3600)
-
-            minute_key = f"{usage_key}:minute:{current_minute}"
-            hour_key = f"{usage_key}:hour:{current_hour}"
-
-            minute_count = int(self.redis.get(minute_key) or 0)
-            hour_count = int(self.redis.get(hour_key) or 0)
-            queue_length = await self.get_queue_length(provider)
-
-            return {
-                "provider": provider,
-                "minute_usage": minute_count,
-                "hour_usage": hour_count,
-                "queue_length": queue_length,
-                "minute_limit": 60,  # Configurable
-                "hour_limit": 1000   # Configurable
-            }
+            minute_limit, hour_limit = 60, 1000  # Configurable
+
+            # Bucket state and queue length of every provider in one pipeline
+            pipe = self.redis.pipeline(transaction=False)
+            for provider in providers:
+                pipe.hmget(self._get_bucket_key(provider, api_key_hash), "m", "h", "ts")
+                pipe.llen(self._get_queue_key(provider))
+            replies = await pipe.execute()
+
+            now = time.time()
+            stats = []
+            for provider, (minute_tokens, hour_tokens, last_refill_ms), queue_length in zip(
+                    providers, replies[::2], replies[1::2]):
+                # Refill as the script would; usage is whatever is missing from a full bucket
+                elapsed = max(0.0, now - float(last_refill_ms) / 1000) if last_refill_ms else 0.0
+                minute_tokens = min(minute_limit, float(minute_tokens or minute_limit) + elapsed * minute_limit / 60)
+                hour_tokens = min(hour_limit, float(hour_tokens or hour_limit) + elapsed * hour_limit / 3600)
+
+                stats.append({
+                    "provider": provider,
+                    "minute_usage": round(minute_limit - minute_tokens),
+                    "hour_usage": round(hour_limit - hour_tokens),
+                    "queue_length": queue_length,
+                    "minute_limit": minute_limit,
+                    "hour_limit": hour_limit
+                })
+            return stats
 
         except Exception as e:
             logger.error(f"Failed to get provider limits: {e}")
-            return {
+            return [{
                 "provider": provider,
                 "error": str(e)
-            }
\ No newline at end of file
+            } for provider in providers]
@@ -0,0 +1,476 @@
+"""
+Sandbox Project Templates
+
+Starter files for new sandbox projects. Every template is a list of
+(relative path, bytes) pairs built once at import time, so creating a
+sandbox only has to write bytes to disk.
+"""
+
+import os
+import sys
+import json
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+# io_uring bindings (optional, Linux only)
+try:
+    import liburing
+    LIBURING_AVAILABLE = sys.platform.startswith("linux")
+except ImportError:
+    LIBURING_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TemplateFiles = List[Tuple[str, bytes]]
+
+# The package name is filled in per sandbox, so this one is serialized on write
+_REACT_PACKAGE_JSON = {
+    "version": "0.1.0",
+    "type": "module",
+    "scripts": {
+        "dev": "vite",
+        "start": "vite",
+        "build": "vite build",
+        "preview": "vite preview"
+    },
+    "dependencies": {
+        "react": "^18.2.0",
+        "react-dom": "^18.2.0"
+    },
+    "devDependencies": {
+        "@types/react": "^18.2.0",
+        "@types/react-dom": "^18.2.0",
+        "@vitejs/plugin-react": "^4.0.0",
+        "vite": "^4.3.0"
+    }
+}
+
+_REACT_VITE_CONFIG = """import { defineConfig } from 'vite'
+import react from '@vitejs/plugin-react'
+
+export default defineConfig({
+  plugins: [react()],
+  server: {
+    host: '0.0.0.0',
+    port: process.env.PORT || 3000
+  }
+})
+"""
+
+_REACT_INDEX_HTML = """<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8" />
+    <link rel="icon" type="image/svg+xml" href="/vite.svg" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>React + Vite</title>
+  </head>
+  <body>
+    <div id="root"></div>
+    <script type="module" src="/src/main.jsx"></script>
+  </body>
+</html>
+"""
+
+_REACT_MAIN_JSX = """import React from 'react'
+import ReactDOM from 'react-dom/client'
+import App from './App.jsx'
+import './index.css'
+
+ReactDOM.createRoot(document.getElementById('root')).render(
+  <React.StrictMode>
+    <App />
+  </React.StrictMode>,
+)
+"""
+
+_REACT_APP_JSX = """import React, { useState } from 'react'
+import './App.css'
+
+function App() {
+  const [count, setCount] = useState(0)
+
+  return (
+    <div className="App">
+      <header className="App-header">
+        <h1>React + Vite Sandbox</h1>
+        <p>Edit <code>src/App.jsx</code> and save to reload.</p>
+        <div className="card">
+          <button onClick={() => setCount((count) => count + 1)}>
+            count is {count}
+          </button>
+          <p>
+            Edit <code>src/App.jsx</code> and save to test HMR
+          </p>
+        </div>
+      </header>
+    </div>
+  )
+}
+
+export default App
+"""
+
+_REACT_APP_CSS = """#root {
+  max-width: 1280px;
+  margin: 0 auto;
+  padding: 2rem;
+  text-align: center;
+}
+
+.App {
+  text-align: center;
+}
+
+.App-header {
+  background-color: #f9f9f9;
+  padding: 2rem;
+  border-radius: 8px;
+  margin-bottom: 2rem;
+}
+
+.card {
+  padding: 2em;
+}
+
+button {
+  border-radius: 8px;
+  border: 1px solid transparent;
+  padding: 0.6em 1.2em;
+  font-size: 1em;
+  font-weight: 500;
+  font-family: inherit;
+  background-color: #1a1a1a;
+  color: white;
+  cursor: pointer;
+  transition: border-color 0.25s;
+}
+
+button:hover {
+  border-color: #646cff;
+}
+
+button:focus,
+button:focus-visible {
+  outline: 4px auto -webkit-focus-ring-color;
+}
+"""
+
+_REACT_INDEX_CSS = """body {
+  margin: 0;
+  display: flex;
+  place-items: center;
+  min-width: 320px;
+  min-height: 100vh;
+}
+
+#root {
+  max-width: 1280px;
+  margin: 0 auto;
+  padding: 2rem;
+  text-align: center;
+}
+
+code {
+  background-color: #f4f4f4;
+  padding: 0.2em 0.4em;
+  border-radius: 4px;
+  font-size: 0.9em;
+}
+"""
+
+_VUE_PACKAGE_JSON = json.dumps({
+    "name": "vue-sandbox",
+    "private": True,
+    "version": "0.0.0",
+    "type": "module",
+    "scripts": {
+        "dev": "vite",
+        "start": "vite",
+        "build": "vite build",
+        "preview": "vite preview"
+    },
+    "dependencies": {
+        "vue": "^3.4.0"
+    },
+    "devDependencies": {
+        "@vitejs/plugin-vue": "^5.0.0",
+        "vite": "^5.0.0"
+    }
+}, indent=2)
+
+_VUE_VITE_CONFIG = """import { defineConfig } from 'vite'
+import vue from '@vitejs/plugin-vue'
+
+export default defineConfig({
+  plugins: [vue()],
+  server: {
+    host: '0.0.0.0',
+    port: process.env.PORT || 3000
+  }
+})
+"""
+
+_VUE_INDEX_HTML = """<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8" />
+    <link rel="icon" type="image/svg+xml" href="/vite.svg" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>Vue + Vite</title>
+  </head>
+  <body>
+    <div id="app"></div>
+    <script type="module" src="/src/main.js"></script>
+  </body>
+</html>
+"""
+
+_VUE_MAIN_JS = """import { createApp } from 'vue'
+import App from './App.vue'
+
+createApp(App).mount('#app')
+"""
+
+_VUE_APP_VUE = """<template>
+  <div id="app">
+    <h1>Vue + Vite Sandbox</h1>
+    <p>Edit <code>src/App.vue</code> and save to reload.</p>
+    <div class="card">
+      <button @click="count++">count is {{ count }}</button>
+      <p>
+        Edit <code>src/App.vue</code> and save to test HMR
+      </p>
+    </div>
+  </div>
+</template>
+
+<script>
+export default {
+  name: 'App',
+  data() {
+    return {
+      count: 0
+    }
+  }
+}
+</script>
+
+<style scoped>
+#app {
+  font-family: Avenir, Helvetica, Arial, sans-serif;
+  -webkit-font-smoothing: antialiased;
+  -moz-osx-font-smoothing: grayscale;
+  text-align: center;
+  color: #2c3e50;
+  margin-top: 60px;
+}
+
+.card {
+  padding: 2em;
+}
+
+button {
+  font-size: 1em;
+  padding: 0.6em 1.2em;
+  border: 1px solid #646cff;
+  border-radius: 8px;
+  background-color: #f9f9f9;
+  cursor: pointer;
+  transition: border-color 0.25s;
+}
+
+button:hover {
+  border-color: #646cff;
+}
+</style>
+"""
+
+_VUE_INDEX_CSS = """body {
+  margin: 0;
+  display: flex;
+  place-items: center;
+  min-width: 320px;
+  min-height: 100vh;
+}
+
+#app {
+  max-width: 1280px;
+  margin: 0 auto;
+  padding: 2rem;
+  text-align: center;
+}
+"""
+
+_VANILLA_INDEX_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Vanilla JS App</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: #f0f0f0;
+        }
+        .container {
+            max-width: 800px;
+            margin: 0 auto;
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #333;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Hello, World!</h1>
+        <p>This is a vanilla JavaScript application.</p>
+        <div id="app"></div>
+    </div>
+    <script src="script.js"></script>
+</body>
+</html>"""
+
+_VANILLA_SCRIPT_JS = """// Vanilla JavaScript Application
+document.addEventListener('DOMContentLoaded', function() {
+    const app = document.getElementById('app');
+
+    // Create a simple interactive element
+    const button = document.createElement('button');
+    button.textContent = 'Click me!';
+    button.style.padding = '10px 20px';
+    button.style.backgroundColor = '#007bff';
+    button.style.color = 'white';
+    button.style.border = 'none';
+    button.style.borderRadius = '4px';
+    button.style.cursor = 'pointer';
+
+    let clickCount = 0;
+    button.addEventListener('click', function() {
+        clickCount++;
+        const message = document.createElement('p');
+        message.textContent = `Button clicked ${clickCount} time(s)!`;
+        message.style.marginTop = '10px';
+        app.appendChild(message);
+    });
+
+    app.appendChild(button);
+});"""
+
+def _encode(files: List[Tuple[str, str]]) -> TemplateFiles:
+    return [(path, content.encode("utf-8")) for path, content in files]
+
+REACT_TEMPLATE: TemplateFiles = _encode([
+    ("vite.config.js", _REACT_VITE_CONFIG),
+    ("index.html", _REACT_INDEX_HTML),
+    ("src/main.jsx", _REACT_MAIN_JSX),
+    ("src/App.jsx", _REACT_APP_JSX),
+    ("src/App.css", _REACT_APP_CSS),
+    ("src/index.css", _REACT_INDEX_CSS),
+])
+
+VUE_TEMPLATE: TemplateFiles = _encode([
+    ("package.json", _VUE_PACKAGE_JSON),
+    ("vite.config.js", _VUE_VITE_CONFIG),
+    ("index.html", _VUE_INDEX_HTML),
+    ("src/main.js", _VUE_MAIN_JS),
+    ("src/App.vue", _VUE_APP_VUE),
+    ("src/index.css", _VUE_INDEX_CSS),
+])
+
+VANILLA_TEMPLATE: TemplateFiles = _encode([
+    ("index.html", _VANILLA_INDEX_HTML),
+    ("script.js", _VANILLA_SCRIPT_JS),
+])
+
+def react_package_json(name: str) -> bytes:
+    """Serialize the React package.json for a sandbox with the given package name."""
+    return json.dumps({"name": name, **_REACT_PACKAGE_JSON}, indent=2).encode("utf-8")
+
+_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+def _write_file(path: str, content: bytes) -> None:
+    fd = os.open(path, _OPEN_FLAGS, 0o666)
+    try:
+        view = memoryview(content)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _write_files_uring(targets: List[Tuple[str, bytes]]) -> List[int]:
+    """Submit a linked open/write/close chain per file in a single io_uring_enter.
+
+    Returns the indices of files that failed or were short-written so the
+    caller can redo them with plain writes.
+    """
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    liburing.io_uring_queue_init(3 * len(targets), ring)
+    try:
+        # Direct descriptors live in the ring's file table, so no fd is ever
+        # handed back to userspace between the open and the write
+        liburing.io_uring_register_files_sparse(ring, len(targets))
+        for index, (path, content) in enumerate(targets):
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_open_direct(sqe, path, _OPEN_FLAGS, index, 0o666)
+            liburing.io_uring_sqe_set_flags(sqe, liburing.IOSQE_IO_LINK)
+            liburing.io_uring_sqe_set_data64(sqe, index)
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_write(sqe, index, content, 0)
+            liburing.io_uring_sqe_set_flags(sqe, liburing.IOSQE_IO_LINK | liburing.IOSQE_FIXED_FILE)
+            liburing.io_uring_sqe_set_data64(sqe, index)
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_close_direct(sqe, index)
+            liburing.io_uring_sqe_set_data64(sqe, index)
+
+        pending = 3 * len(targets)
+        liburing.io_uring_submit_and_wait(ring, pending)
+        written = [0] * len(targets)
+        failed = set()
+        while pending:
+            liburing.io_uring_wait_cqe(ring, cqe)
+            entry = cqe[0]
+            index = entry.user_data
+            try:
+                # The bindings raise OSError for negative results
+                written[index] += entry.res
+            except OSError:
+                failed.add(index)
+            liburing.io_uring_cqe_seen(ring, entry)
+            pending -= 1
+    finally:
+        liburing.io_uring_queue_exit(ring)
+
+    # open and close complete with 0, so only the write adds to the count
+    failed.update(i for i, (_, content) in enumerate(targets) if written[i] != len(content))
+    return sorted(failed)
+
+def write_template(project_path: str, files: TemplateFiles) -> None:
+    """Write template files under project_path, batched through io_uring when available."""
+    root = Path(project_path)
+    root.mkdir(parents=True, exist_ok=True)
+    targets = [(str(root / relative_path), content) for relative_path, content in files]
+
+    # Only subdirectories (e.g. src/) need creating beyond the root itself
+    for subdir in {Path(relative_path).parent for relative_path, _ in files} - {Path(".")}:
+        (root / subdir).mkdir(parents=True, exist_ok=True)
+
+    if LIBURING_AVAILABLE and targets:
+        try:
+            retry = _write_files_uring(targets)
+        except OSError as e:
+            logger.debug("io_uring template write unavailable, using plain writes: %s", e)
+        else:
+            targets = [targets[i] for i in retry]
+
+    for path, content in targets:
+        _write_file(path, content)
@@ -1,36 +1,67 @@
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import Set, Dict, Any, Optional, Tuple
 from datetime import datetime
 from fastapi import WebSocket
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # WebSocket connections for real-time updates
-active_websocket_connections: List[WebSocket] = []
+active_websocket_connections: Set[WebSocket] = set()
 
 # Store active chat WebSocket connections with session IDs
 active_chat_connections: Dict[str, WebSocket] = {}
 
+# Serialized "initial" frame shared by subscribers connecting in quick succession
+INITIAL_SNAPSHOT_TTL_SECONDS = 1.0
+_initial_snapshot: Optional[Tuple[float, str]] = None
+
+def serialize_message(message: Dict[str, Any]) -> str:
+    """Serialize a message once so the same text can be sent to every client or returned as a response body."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def get_initial_snapshot() -> Optional[str]:
+    """Return the cached initial frame if it is still fresh."""
+    if _initial_snapshot and time.monotonic() - _initial_snapshot[0] < INITIAL_SNAPSHOT_TTL_SECONDS:
+        return _initial_snapshot[1]
+    return None
+
+def store_initial_snapshot(frame: str):
+    """Cache a serialized initial frame for new subscribers."""
+    global _initial_snapshot
+    _initial_snapshot = (time.monotonic(), frame)
+
+def invalidate_initial_snapshot():
+    """Drop the cached initial frame after the sandbox list changes."""
+    global _initial_snapshot
+    _initial_snapshot = None
+
 async def broadcast_sandbox_update(update_type: str, sandbox_data: Dict[str, Any]):
     """Broadcast sandbox update to all connected WebSocket clients."""
+    invalidate_initial_snapshot()
     message = {
         "type": update_type,
         "timestamp": datetime.now().isoformat(),
         "sandbox": sandbox_data
     }
 
-    disconnected_clients = []
-    for websocket in active_websocket_connections:
+    payload = serialize_message(message)
+    # Iterate over a snapshot so clients can be dropped mid-broadcast
+    for websocket in tuple(active_websocket_connections):
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(payload)
         except Exception as e:
-            logger.warning(f"Failed to send update to WebSocket client: {e}")
-            disconnected_clients.append(websocket)
-
-    # Remove disconnected clients
-    for client in disconnected_clients:
-        if client in active_websocket_connections:
-            active_websocket_connections.remove(client)
+            logger.warning("Failed to send update to WebSocket client: %s", e)
+            active_websocket_connections.discard(websocket)
 
 async def broadcast_tool_usage(tool_name: str, event_type: str, data: Dict[str, Any], session_id: Optional[str] = None):
     """Broadcast tool usage events to WebSocket clients."""
@@ -48,24 +79,19 @@ async def broadcast_tool_usage(tool_name: str, event_type: str, data: Dict[str,
         try:
             await active_chat_connections[session_id].send_json(message)
         except Exception as e:
-            logger.warning(f"Failed to send tool usage update to session {session_id}: {e}")
+            logger.warning("Failed to send tool usage update to session %s: %s", session_id, e)
             # Remove disconnected session
             if session_id in active_chat_connections:
                 del active_chat_connections[session_id]
     else:
         # Broadcast to all connections if no specific session
-        disconnected_clients = []
-        for websocket in active_websocket_connections:
+        payload = serialize_message(message)
+        for websocket in tuple(active_websocket_connections):
             try:
-                await websocket.send_json(message)
+                await websocket.send_text(payload)
             except Exception as e:
-                logger.warning(f"Failed to send tool usage update to WebSocket client: {e}")
-                disconnected_clients.append(websocket)
-
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            if client in active_websocket_connections:
-                active_websocket_connections.remove(client)
+                logger.warning("Failed to send tool usage update to WebSocket client: %s", e)
+                active_websocket_connections.discard(websocket)
 
 async def broadcast_file_operation(operation_type: str, file_path: str, data: Dict[str, Any], session_id: Optional[str] = None):
     """Broadcast file operation events to WebSocket clients."""
@@ -83,32 +109,27 @@ async def broadcast_file_operation(operation_type: str, file_path: str, data: Di
         try:
             await active_chat_connections[session_id].send_json(message)
         except Exception as e:
-            logger.warning(f"Failed to send file operation update to session {session_id}: {e}")
+            logger.warning("Failed to send file operation update to session %s: %s", session_id, e)
             # Remove disconnected session
             if session_id in active_chat_connections:
                 del active_chat_connections[session_id]
     else:
         # Broadcast to all connections if no specific session
-        disconnected_clients = []
-        for websocket in active_websocket_connections:
+        payload = serialize_message(message)
+        for websocket in tuple(active_websocket_connections):
             try:
-                await websocket.send_json(message)
+                await websocket.send_text(payload)
             except Exception as e:
-                logger.warning(f"Failed to send file operation update to WebSocket client: {e}")
-                disconnected_clients.append(websocket)
-
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            if client in active_websocket_connections:
-                active_websocket_connections.remove(client)
+                logger.warning("Failed to send file operation update to WebSocket client: %s", e)
+                active_websocket_connections.discard(websocket)
 
 def register_chat_connection(session_id: str, websocket: WebSocket):
     """Register a chat WebSocket connection with session ID."""
     active_chat_connections[session_id] = websocket
-    logger.info(f"Registered chat WebSocket for session: {session_id}")
+    logger.info("Registered chat WebSocket for session: %s", session_id)
 
 def unregister_chat_connection(session_id: str):
     """Unregister a chat WebSocket connection."""
     if session_id in active_chat_connections:
         del active_chat_connections[session_id]
-        logger.info(f"Unregistered chat WebSocket for session: {session_id}")
\ No newline at end of file
+        logger.info("Unregistered chat WebSocket for session: %s", session_id)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the token leases of the Redis-backed API rate limiter.
+The token bucket script is replaced by an in-process equivalent and the
+clock is frozen, so no Redis server is needed.
+"""
+
+import asyncio
+import logging
+import app.utils.rate_limiter as rate_limiter_module
+from app.utils.rate_limiter import RateLimiter, LOCAL_LEASE_SECONDS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FakeClock:
+    """Stands in for the time module inside the rate limiter."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+class FakeRedis:
+    """Registers a Python version of TOKEN_BUCKET_LUA holding a single bucket."""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.costs = []
+
+    def register_script(self, script):
+        async def token_bucket(keys, args):
+            requests_per_minute, _, now_ms, cost, take = args
+            self.costs.append(cost)
+            # Give other callers a chance to interleave, as a network round-trip would
+            await asyncio.sleep(0)
+            if self.tokens >= cost:
+                if take:
+                    self.tokens -= cost
+                return [1, self.tokens, self.tokens, 0]
+            wait_ms = (cost - self.tokens) * 60000 // requests_per_minute
+            return [0, self.tokens, self.tokens, wait_ms, 0]
+        return token_bucket
+
+def run_with_clock(coro_factory):
+    """Run a test coroutine with the rate limiter's clock frozen."""
+    clock = FakeClock()
+    real_time = rate_limiter_module.time
+    rate_limiter_module.time = clock
+    try:
+        return asyncio.run(coro_factory(clock))
+    finally:
+        rate_limiter_module.time = real_time
+
+def test_concurrent_acquires_grant_exactly_available():
+    """Concurrent acquires through leases never grant more than the bucket holds."""
+    async def scenario(clock):
+        redis_client = FakeRedis(tokens=25)
+        limiter = RateLimiter(redis_client, local_lease_size=10)
+
+        results = await asyncio.gather(*[
+            limiter.acquire_api_slot("groq", "key", requests_per_minute=25) for _ in range(30)
+        ])
+
+        granted = sum(1 for can_proceed, _, _ in results if can_proceed)
+        assert granted == 25, f"Expected exactly 25 granted, got {granted}"
+        assert redis_client.tokens == 0
+        # Two full batches and one that no longer fits, then the last five one at a time
+        assert redis_client.costs.count(10) == 3, redis_client.costs
+        assert len(redis_client.costs) < 30, "Leases should save script calls"
+        logger.info(f"✅ Concurrent acquires: {granted}/30 granted in {len(redis_client.costs)} script calls")
+
+    run_with_clock(scenario)
+
+def test_lease_expiry():
+    """Unspent leased tokens are dropped once the lease expires."""
+    async def scenario(clock):
+        redis_client = FakeRedis(tokens=100)
+        limiter = RateLimiter(redis_client, local_lease_size=10)
+
+        assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert redis_client.costs == [10]
+
+        # Served from the lease, without touching Redis
+        assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert (await limiter.check_api_limits("groq", "key"))[0]
+        assert redis_client.costs == [10]
+
+        clock.now += LOCAL_LEASE_SECONDS + 1
+        assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert redis_client.costs == [10, 10], "An expired lease should be renewed"
+        assert limiter._leases[("groq", "key")].tokens == 9
+        assert redis_client.tokens == 80
+        logger.info("✅ Lease expiry: stale lease dropped and renewed")
+
+    run_with_clock(scenario)
+
+def test_fallback_to_single_tokens():
+    """When a whole batch no longer fits, calls take single tokens until batching is retried."""
+    async def scenario(clock):
+        redis_client = FakeRedis(tokens=5)
+        limiter = RateLimiter(redis_client, local_lease_size=10)
+
+        assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert redis_client.costs == [10, 1], redis_client.costs
+
+        # No further batch attempts while batching is backed off
+        for _ in range(4):
+            assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert redis_client.costs == [10, 1, 1, 1, 1, 1], redis_client.costs
+
+        can_proceed, _, wait_seconds = await limiter.acquire_api_slot("groq", "key")
+        assert not can_proceed and wait_seconds > 0, "An empty bucket should refuse with a wait"
+
+        # Batching is tried again once the back-off has passed
+        redis_client.tokens = 50
+        clock.now += LOCAL_LEASE_SECONDS + 1
+        assert (await limiter.acquire_api_slot("groq", "key"))[0]
+        assert redis_client.costs[-1] == 10
+        assert redis_client.tokens == 40
+        logger.info("✅ Fallback: single tokens near the limit, batches again afterwards")
+
+    run_with_clock(scenario)
+
+def main():
+    """Run all API rate limiter lease tests."""
+    logger.info("=== API Rate Limiter Lease Test Suite ===")
+    test_concurrent_acquires_grant_exactly_available()
+    test_lease_expiry()
+    test_fallback_to_single_tokens()
+    logger.info("✅ All lease tests passed")
+
+if __name__ == "__main__":
+    main()